@@ -1,29 +1,41 @@
 # app/auth.py
+from uuid import uuid4
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlmodel import Session
 from jose import JWTError, jwt
 from .config import settings
-from .database import get_session
+from .database import get_read_session
+from .revocation import TokenRevocationList, get_revocations
 from .users.crud import get_user_by_username
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
 def create_access_token(data: dict, expires_delta):
     to_encode = data.copy()
-    to_encode.update({"exp": __import__("datetime").datetime.utcnow() + expires_delta})
+    to_encode.update({"exp": __import__("datetime").datetime.utcnow() + expires_delta, "jti": uuid4().hex})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
+async def get_token_payload(token: str = Depends(oauth2_scheme), revocations: TokenRevocationList = Depends(get_revocations)):
+    """Decodifica el JWT y rechaza los tokens revocados (sin tocar la BD)."""
     credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciales inválidas", headers={"WWW-Authenticate": "Bearer"})
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = get_user_by_username(username=username, session=session)
+    if payload.get("sub") is None or await revocations.is_revoked(payload):
+        raise credentials_exception
+    return payload
+
+async def get_current_user(payload: dict = Depends(get_token_payload), session: Session = Depends(get_read_session)):
+    credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciales inválidas", headers={"WWW-Authenticate": "Bearer"})
+    user = get_user_by_username(username=payload["sub"], session=session)
     if user is None:
         raise credentials_exception
     return user
+
+async def require_admin(user=Depends(get_current_user)):
+    if user.username not in settings.ADMIN_USERNAMES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Se requieren permisos de administrador")
+    return user
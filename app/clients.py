@@ -0,0 +1,17 @@
+# app/clients.py
+from fastapi import Request
+
+
+def client_identifier(request: Request) -> str:
+    """
+    Identifica al cliente de la petición (rate limit, lecturas pegadas al
+    primario): el token si viene uno (no lo decodificamos aquí); si no, la IP.
+    """
+    auth = request.headers.get("Authorization", "")
+    if auth.startswith("Bearer "):
+        token = auth.split(" ", 1)[1]
+        return f"user:{token}"
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
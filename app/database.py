@@ -1,13 +1,86 @@
 # app/database.py
+import itertools
+import time
+from collections import OrderedDict
+from typing import Annotated, Callable, Generator, List, Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlmodel import SQLModel, create_engine, Session
-from typing import Generator
 from .config import settings
+from .clients import client_identifier
+
+
+def make_engine(url: str) -> Engine:
+    """Crear engine según el dialecto"""
+    if url.startswith("sqlite"):
+        return create_engine(url, connect_args={"check_same_thread": False})
+    return create_engine(url)
+
+
+engine = make_engine(settings.DATABASE_URL)
+
+
+class ReplicaRouter:
+    """
+    Elige la réplica para las lecturas: round-robin o la de menos conexiones
+    en uso. Un cliente que acaba de escribir en el primario sigue leyendo del
+    primario durante `sticky_seconds` (lee sus propias escrituras aunque la
+    réplica vaya con retraso). El registro de escrituras es por worker.
+    """
+
+    def __init__(
+        self,
+        replicas: List[Engine],
+        strategy: str = "round_robin",
+        sticky_seconds: float = 5.0,
+        max_clients: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if strategy not in ("round_robin", "least_connections"):
+            raise ValueError(f"Estrategia de réplicas desconocida: {strategy!r}")
+        self.replicas = replicas
+        self.strategy = strategy
+        self.sticky_seconds = sticky_seconds
+        self.max_clients = max_clients
+        self._clock = clock
+        self._next = itertools.count()
+        self._recent_writes: "OrderedDict[str, float]" = OrderedDict()
+
+    def mark_write(self, client: str) -> None:
+        self._recent_writes[client] = self._clock() + self.sticky_seconds
+        self._recent_writes.move_to_end(client)
+        while len(self._recent_writes) > self.max_clients:
+            self._recent_writes.popitem(last=False)
+
+    def is_sticky(self, client: str) -> bool:
+        until = self._recent_writes.get(client)
+        if until is None:
+            return False
+        if until <= self._clock():
+            del self._recent_writes[client]
+            return False
+        return True
+
+    def choose(self) -> Engine:
+        if self.strategy == "least_connections":
+            return min(self.replicas, key=lambda e: getattr(e.pool, "checkedout", lambda: 0)())
+        return self.replicas[next(self._next) % len(self.replicas)]
+
+    def engine_for(self, client: Optional[str]) -> Optional[Engine]:
+        """Engine de réplica para este cliente, o `None` si debe leer del primario."""
+        if not self.replicas or (client and self.is_sticky(client)):
+            return None
+        return self.choose()
+
+
+replica_router = ReplicaRouter(
+    [make_engine(url) for url in settings.DATABASE_REPLICA_URLS],
+    strategy=settings.DATABASE_REPLICA_STRATEGY,
+    sticky_seconds=settings.DATABASE_STICKY_PRIMARY_SECONDS,
+)
 
-# Crear engine según el dialecto
-if settings.DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
-else:
-    engine = create_engine(settings.DATABASE_URL)
 
 def create_db_and_tables() -> None:
     """
@@ -22,6 +95,38 @@ def create_db_and_tables() -> None:
 
     SQLModel.metadata.create_all(engine)
 
-def get_session() -> Generator[Session, None, None]:
+    # create_all no altera tablas existentes: columnas/índices nuevos van aquí
+    from app.migrations import upgrade_schema
+    upgrade_schema(engine)
+
+    from app.messages.sharding import create_shard_tables
+    create_shard_tables()
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_primary_write(session: Session) -> None:
+    client = session.info.get("client")
+    if client:
+        replica_router.mark_write(client)
+
+
+def get_session(request: Request) -> Generator[Session, None, None]:
+    """Sesión contra el primario (escrituras y lecturas que deben ver las últimas escrituras)."""
     with Session(engine) as session:
+        # al hacer commit el cliente queda "pegado" al primario unos segundos
+        session.info["client"] = client_identifier(request)
+        yield session
+
+
+def get_read_session(request: Request, primary: Annotated[Session, Depends(get_session)]) -> Generator[Session, None, None]:
+    """
+    Sesión para rutas de solo lectura: usa una réplica si hay y el cliente no
+    escribió hace poco; si no, la sesión del primario (que no abre conexión
+    hasta usarse).
+    """
+    replica = replica_router.engine_for(client_identifier(request))
+    if replica is None:
+        yield primary
+        return
+    with Session(replica) as session:
         yield session
@@ -0,0 +1,22 @@
+# app/health.py
+from fastapi import APIRouter, Depends, Request
+from typing import Annotated, Optional
+
+from .redis_client import ResilientRedis, get_redis
+
+router = APIRouter()
+
+
+@router.get("/healthz/redis")
+async def redis_health(redis: Annotated[Optional[ResilientRedis], Depends(get_redis)]):
+    """Estado del circuit breaker y métricas de latencia de Redis."""
+    if redis is None:
+        return {"state": "disabled"}
+    return redis.status()
+
+
+@router.get("/healthz/admission")
+async def admission_health(request: Request):
+    """Límites, peticiones en curso, en cola y rechazadas por clase de ruta."""
+    limiters = getattr(request.app.state, "admission", None) or {}
+    return {name: limiter.status() for name, limiter in limiters.items()}
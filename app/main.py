@@ -1,11 +1,17 @@
 # app/main.py
+import asyncio
+
 from fastapi import FastAPI
-from redis.asyncio import Redis
 
 from .config import settings
 from .database import create_db_and_tables
+from .messages.sharding import shard_router
+from .middlewares.admission import AdmissionControlMiddleware, AdmissionLimiter
 from .middlewares.rate_limit import RedisRateLimitMiddleware
+from .redis_client import create_redis_client
+from .revocation import TokenRevocationList
 from .routes import init_routes
+from .services import ServiceError, service_error_handler
 
 
 # Crear app
@@ -19,6 +25,28 @@ app.add_middleware(
     time_window=settings.RATE_LIMIT_WINDOW,
 )
 
+# Control de admisión: se añade el último para que sea la capa más externa
+if settings.ADMISSION_ENABLED:
+    app.state.admission = {
+        name: AdmissionLimiter(
+            name,
+            limit=limit,
+            max_queue=settings.ADMISSION_QUEUE_SIZE,
+            queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_MS / 1000,
+            adaptive=settings.ADMISSION_ADAPTIVE,
+            target_latency=settings.ADMISSION_TARGET_LATENCY_MS / 1000,
+        )
+        for name, limit in (
+            ("read", settings.ADMISSION_READ_CONCURRENCY),
+            ("write", settings.ADMISSION_WRITE_CONCURRENCY),
+            ("login", settings.ADMISSION_LOGIN_CONCURRENCY),
+        )
+    }
+    app.add_middleware(AdmissionControlMiddleware, limiters=app.state.admission)
+
+# Errores de dominio -> JSON estándar
+app.add_exception_handler(ServiceError, service_error_handler)
+
 # Registrar rutas
 init_routes(app)
 
@@ -28,18 +56,21 @@ async def on_startup():
     """Inicializa la base de datos y Redis al inicio"""
     create_db_and_tables()
 
-    # Conectar Redis y guardarlo en app.state
-    app.state.redis = Redis(
-        host=settings.REDIS_HOST,
-        port=settings.REDIS_PORT,
-        db=settings.REDIS_DB,
-        decode_responses=True,
-    )
+    # Cliente Redis compartido (pool acotado + circuit breaker) en app.state
+    app.state.redis = create_redis_client()
+
+    # Lista de revocación de JWT: Bloom filter local sincronizado por pub/sub
+    app.state.revocations = TokenRevocationList(app.state.redis)
+    app.state.revocations_task = asyncio.create_task(app.state.revocations.listen())
 
 
 @app.on_event("shutdown")
 async def on_shutdown():
-    """Cerrar Redis al apagar la app"""
+    """Cerrar Redis y el pool de consultas a los shards al apagar la app"""
+    task = getattr(app.state, "revocations_task", None)
+    if task:
+        task.cancel()
+    shard_router.close()
     if hasattr(app.state, "redis"):
         try:
             await app.state.redis.close()
@@ -0,0 +1,351 @@
+#### analytics of messages
+# app/messages/analytics.py
+import json
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+from fastapi import Depends, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import String, cast
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.database import get_read_session
+from app.redis_client import RedisUnavailable, ResilientRedis
+from app.services import ServiceError
+from .models import Message
+from .sharding import shard_router
+
+BUCKET = timedelta(hours=1)
+PERCENTILES = (50, 90, 95, 99)
+
+# Bins finos: enteros exactos hasta 63 y luego crecimiento geométrico de 2^(1/8) (~9%).
+# Son sumables entre buckets, así que los percentiles salen del histograma combinado.
+FINE_EDGES = np.concatenate([
+    np.arange(0, 64, dtype=np.int64),
+    np.unique(np.round(64 * 2 ** (np.arange(0, 8 * 20 + 1) / 8)).astype(np.int64)),
+])
+# Bins del histograma que se devuelve: potencias de dos (todas están en FINE_EDGES)
+REPORT_EDGES = np.concatenate([[0], 2 ** np.arange(0, 27, dtype=np.int64)])
+_REPORT_INDEX = np.searchsorted(FINE_EDGES, REPORT_EDGES)
+
+# user_id se lee como texto: el driver no construye un UUID por fila
+COLUMNS = (
+    Message.created_at,
+    cast(Message.user_id, String),
+    Message.sender,
+    Message.message_length,
+    Message.word_count,
+)
+
+
+def _floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _user_key(value: str) -> str:
+    # forma canónica (SQLite devuelve el UUID en hex, PostgreSQL con guiones)
+    return str(UUID(value))
+
+
+def _to_utc_naive(value: datetime) -> datetime:
+    # created_at se guarda sin zona horaria (UTC)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+# =============================
+# Agregados por bucket
+# =============================
+
+def _empty_bucket() -> dict:
+    return {"count": 0, "length_sum": 0, "words_sum": 0, "length_hist": {}, "words_hist": {}, "users": {}, "senders": {}}
+
+
+def _sparse(row: np.ndarray) -> Dict[str, int]:
+    nonzero = np.flatnonzero(row)
+    return {str(i): int(row[i]) for i in nonzero}
+
+
+def aggregate_range(session: Session, start: datetime, end: datetime, chunk_size: Optional[int] = None) -> Dict[datetime, dict]:
+    """
+    Calcula los agregados por hora de los mensajes en `[start, end)`.
+    Solo se leen las columnas necesarias, por bloques, y cada bloque se
+    procesa en columnas con NumPy (bincount sobre índices bucket × bin).
+    """
+    chunk_size = chunk_size or settings.ANALYTICS_CHUNK_SIZE
+    base = _floor_hour(start)
+    n_buckets = int((end - base) / BUCKET) + 1
+    n_bins = len(FINE_EDGES)
+    base_ts = np.datetime64(base, "s")
+
+    counts = np.zeros(n_buckets, dtype=np.int64)
+    length_sum = np.zeros(n_buckets, dtype=np.int64)
+    words_sum = np.zeros(n_buckets, dtype=np.int64)
+    length_hist = np.zeros(n_buckets * n_bins, dtype=np.int64)
+    words_hist = np.zeros(n_buckets * n_bins, dtype=np.int64)
+    users = [Counter() for _ in range(n_buckets)]
+    senders = [Counter() for _ in range(n_buckets)]
+
+    statement = (
+        select(*COLUMNS)
+        .where(Message.created_at >= start, Message.created_at < end)
+        .execution_options(yield_per=chunk_size)
+    )
+    for chunk in session.exec(statement).partitions(chunk_size):
+        created, user_ids, chunk_senders, lengths, words = zip(*chunk)
+        # created_at es `timestamp without time zone` en UTC: el driver devuelve
+        # datetimes naive y NumPy los convierte de una vez
+        created = np.array(created, dtype="datetime64[s]")
+        lengths = np.fromiter(lengths, dtype=np.int64, count=len(chunk))
+        words = np.fromiter(words, dtype=np.int64, count=len(chunk))
+
+        bucket = ((created - base_ts) // np.timedelta64(1, "h")).astype(np.int64)
+        counts += np.bincount(bucket, minlength=n_buckets)
+        length_sum += np.bincount(bucket, weights=lengths, minlength=n_buckets).astype(np.int64)
+        words_sum += np.bincount(bucket, weights=words, minlength=n_buckets).astype(np.int64)
+
+        length_bin = np.searchsorted(FINE_EDGES, lengths, side="right") - 1
+        words_bin = np.searchsorted(FINE_EDGES, words, side="right") - 1
+        length_hist += np.bincount(bucket * n_bins + length_bin, minlength=n_buckets * n_bins)
+        words_hist += np.bincount(bucket * n_bins + words_bin, minlength=n_buckets * n_bins)
+
+        for values, target, key_name in ((user_ids, users, _user_key), (chunk_senders, senders, str)):
+            # factorización en NumPy; Python solo toca las claves únicas
+            keys, inverse = np.unique(np.array(values), return_inverse=True)
+            names = [key_name(key) for key in keys]
+            pair_counts = np.bincount(bucket * len(keys) + inverse.ravel(), minlength=n_buckets * len(keys))
+            for flat in np.flatnonzero(pair_counts):
+                b, k = divmod(int(flat), len(keys))
+                target[b][names[k]] += int(pair_counts[flat])
+
+    length_hist = length_hist.reshape(n_buckets, n_bins)
+    words_hist = words_hist.reshape(n_buckets, n_bins)
+    return {
+        base + i * BUCKET: {
+            "count": int(counts[i]),
+            "length_sum": int(length_sum[i]),
+            "words_sum": int(words_sum[i]),
+            "length_hist": _sparse(length_hist[i]),
+            "words_hist": _sparse(words_hist[i]),
+            "users": dict(users[i]),
+            "senders": dict(senders[i]),
+        }
+        for i in range(n_buckets)
+        if base + i * BUCKET < end
+    }
+
+
+def combine_buckets(parts: List[Dict[datetime, dict]]) -> Dict[datetime, dict]:
+    """Suma los agregados por hora calculados en cada shard (son mergeables)."""
+    combined: Dict[datetime, dict] = {}
+    for part in parts:
+        for bucket, data in part.items():
+            target = combined.setdefault(bucket, _empty_bucket())
+            for field in ("count", "length_sum", "words_sum"):
+                target[field] += data[field]
+            for field in ("length_hist", "words_hist", "users", "senders"):
+                for key, count in data[field].items():
+                    target[field][key] = target[field].get(key, 0) + count
+    return combined
+
+
+def _dense(buckets: List[dict], field: str) -> np.ndarray:
+    hist = np.zeros(len(FINE_EDGES), dtype=np.int64)
+    for data in buckets:
+        for index, count in data[field].items():
+            hist[int(index)] += count
+    return hist
+
+
+def _percentile(hist: np.ndarray, q: float) -> Optional[float]:
+    total = hist.sum()
+    if total == 0:
+        return None
+    cdf = np.cumsum(hist)
+    target = q / 100 * total
+    i = int(np.searchsorted(cdf, target, side="left"))
+    lo = FINE_EDGES[i]
+    hi = FINE_EDGES[i + 1] - 1 if i + 1 < len(FINE_EDGES) else lo
+    before = cdf[i - 1] if i else 0
+    return float(lo + (hi - lo) * (target - before) / hist[i])
+
+
+def _distribution(hist: np.ndarray, total_sum: int) -> dict:
+    total = int(hist.sum())
+    return {
+        "mean": total_sum / total if total else None,
+        "percentiles": {f"p{q}": _percentile(hist, q) for q in PERCENTILES},
+        "histogram": {
+            "edges": REPORT_EDGES.tolist(),
+            "counts": np.add.reduceat(hist, _REPORT_INDEX).tolist(),
+        },
+    }
+
+
+# =============================
+# Caché por bucket
+# =============================
+
+class AnalyticsCache:
+    """
+    Agregados de buckets de una hora ya cerrados (no van a cambiar).
+    Se guardan en Redis; si Redis no está disponible, en un LRU local.
+    """
+
+    def __init__(self, redis: Optional[ResilientRedis] = None, max_local: int = 5000):
+        self.redis = redis
+        self.max_local = max_local
+        self._local: "OrderedDict[str, dict]" = OrderedDict()
+
+    @staticmethod
+    def _key(bucket: datetime) -> str:
+        return f"analytics:messages:{bucket.isoformat()}"
+
+    async def get_many(self, buckets: List[datetime]) -> Dict[datetime, dict]:
+        found = {}
+        keys = [self._key(b) for b in buckets]
+        for bucket, key in zip(buckets, keys):
+            if key in self._local:
+                self._local.move_to_end(key)
+                found[bucket] = self._local[key]
+        missing = [(b, k) for b, k in zip(buckets, keys) if b not in found]
+        if self.redis is None or not missing:
+            return found
+        try:
+            values = await self.redis.mget([k for _, k in missing])
+        except RedisUnavailable:
+            return found
+        for (bucket, key), value in zip(missing, values):
+            if value is not None:
+                found[bucket] = json.loads(value)
+                self._remember(key, found[bucket])
+        return found
+
+    async def set_many(self, items: Dict[datetime, dict]) -> None:
+        for bucket, data in items.items():
+            key = self._key(bucket)
+            self._remember(key, data)
+            if self.redis is None:
+                continue
+            try:
+                await self.redis.set(key, json.dumps(data), ex=settings.ANALYTICS_CACHE_TTL)
+            except RedisUnavailable:
+                # queda en el LRU local
+                pass
+
+    def _remember(self, key: str, data: dict) -> None:
+        self._local[key] = data
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_local:
+            self._local.popitem(last=False)
+
+
+# =============================
+# Servicio
+# =============================
+
+class MessageAnalyticsService:
+    def __init__(self, session: Session, cache: AnalyticsCache):
+        self.session = session
+        self.cache = cache
+
+    async def summary(self, start: Optional[datetime], end: Optional[datetime], top_users: int = 10) -> dict:
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        end = _to_utc_naive(end) if end else now
+        start = _to_utc_naive(start) if start else end - timedelta(hours=24)
+        if start >= end:
+            raise ServiceError(
+                code="INVALID_RANGE",
+                message="Rango de fechas inválido",
+                details="'start' debe ser anterior a 'end'",
+                http_status=status.HTTP_400_BAD_REQUEST,
+            )
+        if end - start > timedelta(days=settings.ANALYTICS_MAX_RANGE_DAYS):
+            raise ServiceError(
+                code="INVALID_RANGE",
+                message="Rango de fechas demasiado amplio",
+                details=f"El rango máximo es de {settings.ANALYTICS_MAX_RANGE_DAYS} días",
+                http_status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        buckets = []
+        bucket = _floor_hour(start)
+        while bucket < end:
+            buckets.append(bucket)
+            bucket += BUCKET
+
+        # solo se cachean buckets completos dentro del rango y cerrados hace más
+        # del margen: created_at se fija antes del commit y la réplica puede ir
+        # con retraso, así que una hora recién cerrada aún puede recibir filas
+        settled = now - timedelta(seconds=settings.ANALYTICS_CACHE_GRACE_SECONDS)
+        closed = [b for b in buckets if b >= start and b + BUCKET <= min(end, settled)]
+        data = await self.cache.get_many(closed)
+
+        fresh = {}
+        for lo, hi in self._missing_ranges(buckets, data, start, end):
+            fresh.update(await run_in_threadpool(self._aggregate, lo, hi))
+        await self.cache.set_many({b: fresh[b] for b in closed if b in fresh})
+        data.update(fresh)
+
+        return self._merge(start, end, [(b, data.get(b) or _empty_bucket()) for b in buckets], top_users)
+
+    def _aggregate(self, start: datetime, end: datetime) -> Dict[datetime, dict]:
+        if not shard_router.enabled:
+            return aggregate_range(self.session, start, end)
+        return combine_buckets(shard_router.fan_out(lambda session: aggregate_range(session, start, end)))
+
+    @staticmethod
+    def _missing_ranges(buckets: List[datetime], cached: dict, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        """Agrupa los buckets sin caché en rangos contiguos (una consulta por rango)."""
+        ranges = []
+        for bucket in buckets:
+            if bucket in cached:
+                continue
+            lo, hi = max(bucket, start), min(bucket + BUCKET, end)
+            if ranges and ranges[-1][1] == lo:
+                ranges[-1] = (ranges[-1][0], hi)
+            else:
+                ranges.append((lo, hi))
+        return ranges
+
+    @staticmethod
+    def _merge(start: datetime, end: datetime, buckets: List[Tuple[datetime, dict]], top_users: int) -> dict:
+        values = [data for _, data in buckets]
+        users, senders = Counter(), Counter()
+        for data in values:
+            users.update(data["users"])
+            senders.update(data["senders"])
+        return {
+            "start": start,
+            "end": end,
+            "total_messages": sum(data["count"] for data in values),
+            "message_length": _distribution(_dense(values, "length_hist"), sum(d["length_sum"] for d in values)),
+            "word_count": _distribution(_dense(values, "words_hist"), sum(d["words_sum"] for d in values)),
+            "by_hour": [{"bucket": bucket, "count": data["count"]} for bucket, data in buckets],
+            "by_sender": dict(senders),
+            "top_users": [{"user_id": user_id, "count": count} for user_id, count in users.most_common(top_users)],
+        }
+
+
+# =============================
+# Inyección de dependencias
+# =============================
+
+def get_analytics_cache(request: Request) -> AnalyticsCache:
+    state = request.app.state
+    if getattr(state, "analytics_cache", None) is None:
+        redis = getattr(state, "redis", None)
+        state.analytics_cache = AnalyticsCache(redis if isinstance(redis, ResilientRedis) else None)
+    return state.analytics_cache
+
+
+def get_analytics_service(
+    session: Annotated[Session, Depends(get_read_session)],
+    cache: Annotated[AnalyticsCache, Depends(get_analytics_cache)],
+):
+    return MessageAnalyticsService(session=session, cache=cache)
@@ -0,0 +1,58 @@
+#### compresión del contenido de mensajes
+# app/messages/compression.py
+import zlib
+from typing import Optional
+
+from app.config import settings
+
+try:  # zstd es opcional; sin la librería se usa zlib
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# Primer byte de `content_blob`: indica el formato del resto del blob
+ZLIB_MARKER = b"\x01"
+ZSTD_MARKER = b"\x02"
+
+
+def _codec() -> Optional[str]:
+    codec = settings.MESSAGE_COMPRESSION.lower()
+    if codec in ("", "none"):
+        return None
+    if codec == "zstd" and zstandard is None:
+        return "zlib"
+    return codec
+
+
+def compress_content(content: str) -> Optional[bytes]:
+    """
+    Comprime `content` si la compresión está activa y supera el umbral.
+    Devuelve `None` cuando el mensaje debe guardarse como texto plano.
+    """
+    codec = _codec()
+    raw = content.encode("utf-8")
+    if codec is None or len(raw) < settings.MESSAGE_COMPRESSION_THRESHOLD:
+        return None
+
+    if codec == "zstd":
+        blob = ZSTD_MARKER + zstandard.ZstdCompressor(level=settings.MESSAGE_COMPRESSION_LEVEL).compress(raw)
+    else:
+        blob = ZLIB_MARKER + zlib.compress(raw, settings.MESSAGE_COMPRESSION_LEVEL)
+    # si no se gana espacio no vale la pena pagar la descompresión al leer
+    return blob if len(blob) < len(raw) else None
+
+
+def decompress_content(blob: bytes) -> str:
+    marker, payload = blob[:1], blob[1:]
+    if marker == ZLIB_MARKER:
+        return zlib.decompress(payload).decode("utf-8")
+    if marker == ZSTD_MARKER:
+        if zstandard is None:
+            raise RuntimeError("Mensaje comprimido con zstd pero 'zstandard' no está instalado")
+        return zstandard.ZstdDecompressor().decompress(payload).decode("utf-8")
+    raise ValueError(f"Formato de contenido comprimido desconocido: {marker!r}")
+
+
+def message_content(content: str, content_blob: Optional[bytes]) -> str:
+    """Texto original de un mensaje a partir de sus dos columnas."""
+    return decompress_content(content_blob) if content_blob is not None else content
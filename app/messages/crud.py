@@ -1,15 +1,19 @@
 #### cruds of messages
 
 # app/messages/crud.py
-from sqlmodel import Session, select
+from sqlmodel import Session, select, func
 from .models import Message
-from typing import List, Optional
+from .compression import compress_content, message_content
+from typing import Iterator, List, Optional, Tuple
+from datetime import datetime
 from uuid import UUID
 
 def create_db_message(session: Session, user_id: UUID, session_id: str, content: str, sender: str, message_length: int, word_count: int) -> Message:
+    content_blob = compress_content(content)
     msg = Message(
         session_id=session_id,
-        content=content,
+        content="" if content_blob is not None else content,
+        content_blob=content_blob,
         sender=sender,
         user_id=user_id,
         message_length=message_length,
@@ -26,3 +30,44 @@ def get_messages_by_session_id(session: Session, session_id: str, limit: int = 1
         statement = statement.where(Message.sender == sender)
     statement = statement.limit(limit).offset(offset)
     return session.exec(statement).all()
+
+def get_messages_by_user_id(session: Session, user_id: UUID, limit: int = 100, offset: int = 0) -> List[Message]:
+    """Historial de un usuario, del más reciente al más antiguo."""
+    statement = select(Message).where(Message.user_id == user_id).order_by(Message.created_at.desc())
+    return session.exec(statement.offset(offset).limit(limit)).all()
+
+def get_session_validator(session: Session, session_id: str, sender: Optional[str] = None) -> Tuple[int, Optional[datetime]]:
+    """
+    Validador barato de una sesión: (número de mensajes, último created_at).
+    Una sola consulta agregada sobre el índice (session_id, created_at), sin cargar filas.
+    """
+    statement = select(func.count(), func.max(Message.created_at)).where(Message.session_id == session_id)
+    if sender:
+        statement = statement.where(Message.sender == sender)
+    count, last_created = session.exec(statement).one()
+    return count, last_created
+
+def iter_messages_by_session_id(session: Session, session_id: str, sender: Optional[str] = None, batch_size: int = 500) -> Iterator[dict]:
+    """
+    Recorre los mensajes de una sesión por lotes para exportarlos.
+    Selecciona columnas (no entidades), así cada contenido se descomprime
+    solo cuando se consume su fila.
+    """
+    statement = select(
+        Message.message_id, Message.session_id, Message.user_id, Message.content, Message.content_blob,
+        Message.created_at, Message.sender, Message.message_length, Message.word_count,
+    ).where(Message.session_id == session_id)
+    if sender:
+        statement = statement.where(Message.sender == sender)
+    statement = statement.order_by(Message.created_at).execution_options(yield_per=batch_size)
+    for row in session.exec(statement):
+        yield {
+            "message_id": row.message_id,
+            "session_id": row.session_id,
+            "user_id": str(row.user_id),
+            "content": message_content(row.content, row.content_blob),
+            "created_at": row.created_at.isoformat(),
+            "sender": row.sender,
+            "message_length": row.message_length,
+            "word_count": row.word_count,
+        }
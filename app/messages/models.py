@@ -1,19 +1,36 @@
 #### Models of messages
 from typing import Optional
+from sqlalchemy import Index, LargeBinary, event
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlmodel import Field, SQLModel, Relationship
 from datetime import datetime, timezone
 from uuid import UUID, uuid4
 from app.users.models import User
+from .compression import decompress_content
 
 class Message(SQLModel, table=True):
     """Modelo para los mensajes con todos los metadatos."""
+    # cubre el validador de caché (count/max(created_at) por sesión)
+    __table_args__ = (Index("ix_message_session_id_created_at", "session_id", "created_at"),)
+
     message_id: Optional[str] = Field(default_factory=lambda: str(uuid4()), primary_key=True)
     session_id: str = Field(index=True)
-    user_id: UUID = Field(foreign_key="user.id")
+    user_id: UUID = Field(foreign_key="user.id", index=True)
     content: str
+    # contenido comprimido (primer byte = formato); si está presente `content` se guarda vacío
+    content_blob: Optional[bytes] = Field(default=None, sa_type=LargeBinary)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     sender: str  # 'user' o 'system'
     message_length: int
     word_count: int
     
     user: User = Relationship(back_populates="messages")
+
+
+@event.listens_for(Message, "load")
+@event.listens_for(Message, "refresh")
+def _decompress_on_load(target: Message, *args) -> None:
+    """Descomprime el contenido al cargar desde la BD sin marcar el objeto como modificado."""
+    blob = target.__dict__.get("content_blob")
+    if blob is not None:
+        set_committed_value(target, "content", decompress_content(blob))
@@ -1,14 +1,18 @@
 ###### routes of messages
 # app/messages/routes.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from typing import List, Optional, Annotated
+from datetime import datetime
 from sqlmodel import Session
 from uuid import UUID
 from app.database import get_session
-from .schemas import MessageCreate, MessageResponse
+from app.conditional import is_not_modified, make_etag, not_modified_response, validator_headers
+from .schemas import MessageCreate, MessageResponse, MessageAnalytics
+from .analytics import MessageAnalyticsService, get_analytics_service
 from .crud import create_db_message, get_messages_by_session_id
 from app.users.crud import get_user_by_username  # optional
-from app.services import MessageService, get_message_service
+from app.services import MessageService, get_message_service, get_message_reader_service
 
 router = APIRouter()
 
@@ -24,7 +28,29 @@ def create_message(message: MessageCreate, message_service: Annotated[MessageSer
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# debe declararse antes de "/{session_id}" para que "analytics" no se tome como id de sesión
+@router.get("/analytics", response_model=MessageAnalytics)
+async def get_analytics(analytics: Annotated[MessageAnalyticsService, Depends(get_analytics_service)], start: Optional[datetime] = None, end: Optional[datetime] = None, top_users: Annotated[int, Query(ge=1, le=100)] = 10):
+    return await analytics.summary(start, end, top_users)
+
+@router.get("/user/{user_id}", response_model=List[MessageResponse])
+def get_user_messages(user_id: UUID, message_service: Annotated[MessageService, Depends(get_message_reader_service)], limit: Annotated[int, Query(le=100)] = 100, offset: Annotated[int, Query(ge=0)] = 0):
+    messages = message_service.get_user_messages(user_id, limit, offset)
+    return [MessageResponse.from_message(message) for message in messages]
+
 @router.get("/{session_id}", response_model=List[MessageResponse])
-def get_messages(session_id: str, message_service: Annotated[MessageService, Depends(get_message_service)], limit: Annotated[int, Query(le=100)] = 100, offset: Annotated[int, Query(ge=0)] = 0, sender: Optional[str] = None):
+def get_messages(session_id: str, request: Request, response: Response, message_service: Annotated[MessageService, Depends(get_message_reader_service)], limit: Annotated[int, Query(le=100)] = 100, offset: Annotated[int, Query(ge=0)] = 0, sender: Optional[str] = None):
+    # validador barato: si el cliente ya tiene esta versión no se cargan ni serializan filas
+    count, last_created = message_service.get_messages_validator(session_id, sender)
+    etag = make_etag(session_id, count, last_created, limit, offset, sender)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, last_created)
+
     msgs = message_service.get_messages(session_id, limit, offset, sender)
+    response.headers.update(validator_headers(etag, last_created))
     return msgs
+
+@router.get("/{session_id}/export")
+def export_messages(session_id: str, message_service: Annotated[MessageService, Depends(get_message_reader_service)], sender: Optional[str] = None):
+    lines = message_service.export_messages(session_id, sender)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
@@ -1,7 +1,7 @@
 #### schemas of messages
 from pydantic import BaseModel
 from uuid import UUID
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 
@@ -30,3 +30,54 @@ class MessageResponse(BaseModel):
     class Config:
         orm_mode = True
 
+    @classmethod
+    def from_message(cls, message) -> "MessageResponse":
+        """
+        Respuesta a partir del modelo ORM. Los metadatos van anidados y en el
+        modelo `metadata` es el MetaData de SQLAlchemy, así que no sirve la
+        lectura directa de atributos.
+        """
+        return cls(
+            message_id=message.message_id,
+            session_id=message.session_id,
+            user_id=message.user_id,
+            content=message.content,
+            created_at=message.created_at,
+            sender=message.sender,
+            metadata=MessageMetaData(
+                word_count=message.word_count,
+                character_count=message.message_length,
+                created_at=message.created_at,
+            ),
+        )
+
+
+class HistogramResponse(BaseModel):
+    """Histograma: `counts[i]` cuenta los valores en `[edges[i], edges[i + 1])`."""
+    edges: List[float]
+    counts: List[int]
+
+class DistributionResponse(BaseModel):
+    """Distribución de una métrica (percentiles aproximados por histograma)."""
+    mean: Optional[float]
+    percentiles: Dict[str, Optional[float]]
+    histogram: HistogramResponse
+
+class TimeBucketCount(BaseModel):
+    bucket: datetime
+    count: int
+
+class UserActivity(BaseModel):
+    user_id: UUID
+    count: int
+
+class MessageAnalytics(BaseModel):
+    """Resumen analítico de los mensajes en un rango de tiempo."""
+    start: datetime
+    end: datetime
+    total_messages: int
+    message_length: DistributionResponse
+    word_count: DistributionResponse
+    by_hour: List[TimeBucketCount]
+    by_sender: Dict[str, int]
+    top_users: List[UserActivity]
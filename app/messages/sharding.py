@@ -0,0 +1,237 @@
+#### sharding of messages
+# app/messages/sharding.py
+"""
+Reparto opcional de la tabla `message` entre varias bases de datos.
+
+Cada `session_id` pertenece a un shard según un anillo de hashing
+consistente: al añadir un shard solo se mueve ~1/N de las sesiones.
+Las operaciones de una sesión van a su shard; las consultas que cruzan
+sesiones (historial de un usuario, analítica) se lanzan en paralelo contra
+todos los shards y se combinan.
+
+Tras añadir shards a `MESSAGE_SHARD_URLS` (siempre al final) hay que mover
+las sesiones que cambian de dueño:
+
+    python -m app.messages.sharding rebalance [--dry-run]
+
+Al activar el sharding los mensajes existentes siguen en la tabla `message`
+del primario, que la app ya no lee; `--from-primary` los reparte también
+(no hace falta si la URL del primario figura en `MESSAGE_SHARD_URLS`).
+"""
+import argparse
+import bisect
+import hashlib
+import heapq
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, TypeVar
+
+import sqlalchemy as sa
+from sqlalchemy import ForeignKeyConstraint, MetaData
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.database import engine as primary_engine, make_engine
+from .models import Message
+
+T = TypeVar("T")
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class ConsistentHashRing:
+    """Anillo de hashing consistente con `vnodes` nodos virtuales por shard."""
+
+    def __init__(self, nodes: List[str], vnodes: int = 128):
+        self._points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        self._keys = [point for point, _ in self._points]
+
+    def node_for(self, key: str) -> str:
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._points[index][1]
+
+
+class ShardRouter:
+    """
+    Enruta cada `session_id` a su shard. El pool de `fan_out` tiene un hilo
+    por shard y por consulta concurrente (`concurrency`), para que una
+    analítica lenta no deje en cola al historial de otras peticiones.
+    """
+
+    def __init__(self, engines: Dict[str, Engine], vnodes: int = 128, concurrency: int = 8):
+        self.engines = engines
+        self.ring = ConsistentHashRing(list(engines), vnodes) if engines else None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if engines:
+            self._executor = ThreadPoolExecutor(
+                max_workers=len(engines) * max(1, concurrency), thread_name_prefix="shard",
+            )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.engines)
+
+    def shard_for(self, session_id: str) -> str:
+        return self.ring.node_for(session_id)
+
+    def engine_for(self, session_id: str) -> Engine:
+        return self.engines[self.shard_for(session_id)]
+
+    def fan_out(self, fn: Callable[[Session], T]) -> List[T]:
+        """Ejecuta `fn` en todos los shards a la vez, cada uno con su propia sesión."""
+        def run(engine: Engine) -> T:
+            with Session(engine) as session:
+                return fn(session)
+
+        return list(self._executor.map(run, self.engines.values()))
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+shard_router = ShardRouter(
+    {f"shard{i}": make_engine(url) for i, url in enumerate(settings.MESSAGE_SHARD_URLS)},
+    vnodes=settings.MESSAGE_SHARD_VNODES,
+    concurrency=settings.MESSAGE_SHARD_FANOUT_CONCURRENCY,
+)
+
+
+@contextmanager
+def session_for(default: Session, session_id: str) -> Iterator[Session]:
+    """Sesión del shard dueño de `session_id`, o `default` si no hay sharding."""
+    if not shard_router.enabled:
+        yield default
+        return
+    with Session(shard_router.engine_for(session_id)) as session:
+        yield session
+
+
+def bind_for(default: Session, session_id: str) -> Engine:
+    """Engine del shard dueño de `session_id`, o el de `default` si no hay sharding."""
+    if not shard_router.enabled:
+        return default.get_bind()
+    return shard_router.engine_for(session_id)
+
+
+def shard_metadata() -> MetaData:
+    """
+    Copia de la tabla `message` sin claves foráneas: `user` vive en el
+    primario y no se puede referenciar desde otra base de datos.
+    """
+    metadata = MetaData()
+    table = Message.__table__.to_metadata(metadata)
+    for constraint in [c for c in table.constraints if isinstance(c, ForeignKeyConstraint)]:
+        table.constraints.discard(constraint)
+    table.foreign_keys.clear()
+    for column in table.columns:
+        column.foreign_keys.clear()
+    return metadata
+
+
+def create_shard_tables() -> None:
+    from app.migrations import upgrade_message_table
+
+    metadata = shard_metadata()
+    for engine in shard_router.engines.values():
+        metadata.create_all(engine)
+        # shards creados con una versión anterior (o el primario como shard)
+        upgrade_message_table(engine)
+
+
+def merge_by_created_at(results: List[List[Message]], limit: int, offset: int = 0) -> List[Message]:
+    """Combina listas ya ordenadas por `created_at` descendente de cada shard."""
+    merged = heapq.merge(*results, key=lambda m: m.created_at, reverse=True)
+    return list(merged)[offset:offset + limit]
+
+
+# =============================
+# Rebalanceo
+# =============================
+
+def rebalance(
+    router: Optional[ShardRouter] = None,
+    batch_size: int = 1000,
+    dry_run: bool = False,
+    primary: Optional[Engine] = None,
+) -> Dict[str, int]:
+    """
+    Mueve cada sesión que está en un shard que ya no es su dueño.
+    Es idempotente: copia solo los mensajes que faltan en el destino y borra
+    del origen después de confirmar la copia, así que se puede relanzar.
+
+    Con `primary`, los mensajes de la tabla del primario (anteriores al
+    sharding) se mueven todos a su shard, salvo que el primario sea un shard.
+    """
+    router = router or shard_router
+    sources = list(router.engines.items())
+    if primary is not None and all(primary.url != engine.url for engine in router.engines.values()):
+        sources.append(("primary", primary))
+    moved = {"sessions": 0, "messages": 0}
+    for name, engine in sources:
+        with Session(engine) as source:
+            session_ids = source.exec(select(Message.session_id).distinct()).all()
+            for session_id in session_ids:
+                owner = router.shard_for(session_id)
+                if owner == name:
+                    continue
+                moved["sessions"] += 1
+                if dry_run:
+                    continue
+                moved["messages"] += _move_session(source, router.engines[owner], session_id, batch_size)
+    return moved
+
+
+def _move_session(source: Session, target_engine: Engine, session_id: str, batch_size: int) -> int:
+    table = Message.__table__
+    columns = [c.name for c in table.columns]
+    copied = 0
+    on_target = []
+    with Session(target_engine) as target:
+        existing = set(target.execute(sa.select(table.c.message_id).where(table.c.session_id == session_id)).scalars())
+        statement = sa.select(table).where(table.c.session_id == session_id).execution_options(yield_per=batch_size)
+        for chunk in source.execute(statement).partitions(batch_size):
+            rows = [dict(zip(columns, row)) for row in chunk if row.message_id not in existing]
+            if rows:
+                target.execute(table.insert(), rows)
+                copied += len(rows)
+            on_target.extend(row.message_id for row in chunk)
+        target.commit()
+
+    # se borran solo las filas que ya están en el destino: un worker con la
+    # configuración antigua puede escribir en el origen durante la copia, y esa
+    # fila se queda para la siguiente pasada en vez de perderse
+    for i in range(0, len(on_target), batch_size):
+        source.execute(sa.delete(table).where(table.c.message_id.in_(on_target[i:i + batch_size])))
+        source.commit()
+    return copied
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Herramientas de sharding de mensajes")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebalance_parser = sub.add_parser("rebalance", help="mueve las sesiones a su shard actual")
+    rebalance_parser.add_argument("--dry-run", action="store_true")
+    rebalance_parser.add_argument("--batch-size", type=int, default=1000)
+    rebalance_parser.add_argument(
+        "--from-primary", action="store_true",
+        help="reparte también los mensajes de la tabla del primario (al activar el sharding)",
+    )
+    args = parser.parse_args(argv)
+
+    if not shard_router.enabled:
+        parser.error("MESSAGE_SHARD_URLS no está configurado")
+    create_shard_tables()
+    primary = primary_engine if args.from_primary else None
+    moved = rebalance(batch_size=args.batch_size, dry_run=args.dry_run, primary=primary)
+    verb = "a mover" if args.dry_run else "movidas"
+    print(f"Sesiones {verb}: {moved['sessions']} (mensajes copiados: {moved['messages']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+# app/middlewares/admission.py
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from fastapi import status
+
+from app.services import ServiceError, service_error_response
+
+
+class Overloaded(Exception):
+    """No hay hueco ni en los slots ni en la cola dentro del plazo."""
+
+
+class AdmissionLimiter:
+    """
+    Límite de concurrencia con una cola corta y acotada.
+
+    - Hasta `limit` peticiones en curso; el resto espera en una cola FIFO
+      de como mucho `max_queue` peticiones y `queue_timeout` segundos.
+    - Si la cola está llena o vence el plazo se rechaza (`Overloaded`).
+    - Con `adaptive=True` el límite se ajusta por AIMD según la latencia
+      observada: +1/limit si está por debajo de `target_latency`,
+      ×`backoff` (como mucho una vez por `target_latency`) si la supera.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        max_queue: int = 32,
+        queue_timeout: float = 0.5,
+        adaptive: bool = False,
+        target_latency: float = 0.25,
+        min_limit: int = 1,
+        max_limit: Optional[int] = None,
+        backoff: float = 0.9,
+    ):
+        self.name = name
+        self.limit = float(limit)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.adaptive = adaptive
+        self.target_latency = target_latency
+        self.min_limit = min_limit
+        self.max_limit = max_limit or limit * 4
+        self.backoff = backoff
+        self.in_flight = 0
+        self.rejected = 0
+        self._waiters: deque = deque()
+        self._last_decrease = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.capacity and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self.name)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # el slot llegó justo al vencer el plazo: lo aprovechamos
+                return
+            waiter.cancel()
+            self._waiters.remove(waiter)
+            self.rejected += 1
+            raise Overloaded(self.name)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self, latency: Optional[float] = None) -> None:
+        self.in_flight -= 1
+        if latency is not None and self.adaptive:
+            self._adapt(latency)
+        # el slot pasa directamente al siguiente de la cola
+        while self._waiters and self.in_flight < self.capacity:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _adapt(self, latency: float) -> None:
+        if latency <= self.target_latency:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            return
+        now = time.monotonic()
+        if now - self._last_decrease >= self.target_latency:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+            self._last_decrease = now
+
+    def status(self) -> dict:
+        return {
+            "limit": self.capacity,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "rejected": self.rejected,
+        }
+
+
+class AdmissionControlMiddleware:
+    """
+    Middleware ASGI de control de admisión por clase de ruta:
+    `login` (POST /token, bcrypt), `read` (GET/HEAD/OPTIONS) y `write` (resto).
+    A diferencia del rate limit (por cliente) limita la carga total del
+    servidor y responde 503 con `Retry-After` en vez de dejar que las
+    peticiones se acumulen en el threadpool y en el pool de conexiones.
+    """
+
+    READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+    def __init__(
+        self,
+        app,
+        limiters: Dict[str, AdmissionLimiter],
+        login_paths: Optional[list] = None,
+        exempt_paths: Optional[list] = None,
+        retry_after: int = 1,
+    ):
+        self.app = app
+        self.limiters = limiters
+        self.login_paths = set(login_paths or ["/token"])
+        self.exempt_paths = exempt_paths or ["/docs", "/openapi.json", "/healthz", "/static"]
+        self.retry_after = retry_after
+
+    def _route_class(self, scope) -> str:
+        if scope["path"] in self.login_paths:
+            return "login"
+        return "read" if scope["method"] in self.READ_METHODS else "write"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or any(scope["path"].startswith(p) for p in self.exempt_paths):
+            return await self.app(scope, receive, send)
+
+        limiter = self.limiters.get(self._route_class(scope))
+        if limiter is None:
+            return await self.app(scope, receive, send)
+
+        try:
+            await limiter.acquire()
+        except Overloaded:
+            error = ServiceError(
+                code="SERVICE_OVERLOADED",
+                message="Servicio saturado",
+                details=f"Demasiadas peticiones '{limiter.name}' en curso; reintenta en {self.retry_after}s",
+                http_status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+            response = service_error_response(error, headers={"Retry-After": str(self.retry_after)})
+            return await response(scope, receive, send)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - start)
@@ -5,6 +5,37 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from fastapi import Request, status
 from fastapi.responses import JSONResponse
 
+from app.clients import client_identifier
+from app.redis_client import RedisUnavailable
+
+
+class LocalRateLimiter:
+    """
+    Ventana fija en memoria del proceso. Se usa como modo degradado mientras
+    Redis no está disponible (el límite pasa a ser por worker).
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._windows = {}
+
+    def hit(self, key: str, time_window: int):
+        now = time.monotonic()
+        count, expires_at = self._windows.get(key, (0, 0.0))
+        if now >= expires_at:
+            if len(self._windows) >= self.max_keys:
+                self._purge(now)
+            count, expires_at = 0, now + time_window
+        count += 1
+        self._windows[key] = (count, expires_at)
+        return count, int(expires_at - now)
+
+    def _purge(self, now: float) -> None:
+        self._windows = {k: v for k, v in self._windows.items() if v[1] > now}
+        if len(self._windows) >= self.max_keys:
+            self._windows.clear()
+
+
 class RedisRateLimitMiddleware(BaseHTTPMiddleware):
     def __init__(
         self,
@@ -21,28 +52,20 @@ class RedisRateLimitMiddleware(BaseHTTPMiddleware):
         self.time_window = time_window
         self.key_prefix = key_prefix
         self.exempt_paths = exempt_paths or ["/docs", "/openapi.json", "/healthz", "/static"]
+        self.local = LocalRateLimiter()
 
-    @property
-    def redis(self):
+    def _get_redis(self, request: Request):
         # prefer self._redis, si no, intentar leer app.state.redis
         if self._redis:
             return self._redis
-        # getattr because self.app is set by BaseHTTPMiddleware
-        return getattr(self.app.state, "redis", None)
+        # self.app es la siguiente capa ASGI; el estado vive en la app de la request
+        return getattr(request.app.state, "redis", None)
 
     def _key(self, identifier: str) -> str:
         return f"{self.key_prefix}:{identifier}"
 
     def _identifier(self, request: Request) -> str:
-        # si viene token, intenta usarlo (no decodificamos aquí); fallback IP
-        auth = request.headers.get("Authorization", "")
-        if auth.startswith("Bearer "):
-            token = auth.split(" ", 1)[1]
-            return f"user:{token}"
-        forwarded = request.headers.get("X-Forwarded-For")
-        if forwarded:
-            return forwarded.split(",")[0].strip()
-        return request.client.host
+        return client_identifier(request)
 
     async def dispatch(self, request: Request, call_next):
         # excluir paths
@@ -50,17 +73,26 @@ class RedisRateLimitMiddleware(BaseHTTPMiddleware):
             if request.url.path.startswith(p):
                 return await call_next(request)
 
-        redis = self.redis
+        redis = self._get_redis(request)
         if not redis:
             # si no hay redis disponible, no limitamos (útil para tests/dev)
             return await call_next(request)
 
         ident = self._identifier(request)
         key = self._key(ident)
-        current = await redis.incr(key)
-        if current == 1:
-            await redis.expire(key, self.time_window)
-        ttl = await redis.ttl(key)
+        mode = "redis"
+        try:
+            current = await redis.incr(key)
+            ttl = await redis.ttl(key)
+            if ttl < 0:
+                # clave nueva, o un EXPIRE anterior falló: sin TTL la clave no
+                # caducaría nunca y el cliente quedaría bloqueado para siempre
+                await redis.expire(key, self.time_window)
+                ttl = self.time_window
+        except RedisUnavailable:
+            # Redis lento o caído: limitamos en memoria hasta que se recupere
+            mode = "degraded"
+            current, ttl = self.local.hit(key, self.time_window)
 
         if current > self.rate_limit:
             reset_ts = int(time.time()) + (ttl if ttl and ttl > 0 else self.time_window)
@@ -79,4 +111,5 @@ class RedisRateLimitMiddleware(BaseHTTPMiddleware):
         response.headers["X-RateLimit-Limit"] = str(self.rate_limit)
         response.headers["X-RateLimit-Remaining"] = str(max(0, self.rate_limit - int(current)))
         response.headers["X-RateLimit-Reset"] = str(ttl)
+        response.headers["X-RateLimit-Mode"] = mode
         return response
@@ -0,0 +1,85 @@
+# app/migrations.py
+"""
+Actualización de tablas ya existentes.
+
+`SQLModel.metadata.create_all` solo crea las tablas que faltan: nunca añade
+columnas a una tabla existente. Los cambios posteriores a la creación de la
+tabla se aplican aquí, de forma idempotente, al arrancar la app
+(`create_db_and_tables`) o a mano antes de desplegar:
+
+    python -m app.migrations
+"""
+import sys
+from typing import List, Optional
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Engine
+
+
+def _add_missing_columns(connection, table: sa.Table, names: List[str]) -> List[str]:
+    existing = {c["name"] for c in sa.inspect(connection).get_columns(table.name)}
+    preparer = connection.dialect.identifier_preparer
+    applied = []
+    for name in names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        column_type = column.type.compile(dialect=connection.dialect)
+        # columnas nuevas siempre nullable: las filas existentes quedan a NULL
+        connection.execute(sa.text(
+            f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {column_type}"
+        ))
+        applied.append(f"{table.name}.{name}")
+    return applied
+
+
+def _create_missing_indexes(connection, table: sa.Table, names: List[str]) -> List[str]:
+    existing = {i["name"] for i in sa.inspect(connection).get_indexes(table.name)}
+    applied = []
+    for index in table.indexes:
+        if index.name in names and index.name not in existing:
+            index.create(connection)
+            applied.append(index.name)
+    return applied
+
+
+def upgrade_message_table(engine: Engine) -> List[str]:
+    """Añade a `message` lo que create_all no añade; devuelve los cambios aplicados."""
+    from app.messages.models import Message
+
+    table = Message.__table__
+    with engine.begin() as connection:
+        if not sa.inspect(connection).has_table(table.name):
+            return []
+        applied = _add_missing_columns(connection, table, ["content_blob"])
+        # índice del validador de GET condicional (count/max(created_at) por sesión)
+        applied += _create_missing_indexes(connection, table, ["ix_message_session_id_created_at"])
+        # historial por usuario (consulta que se lanza contra todos los shards)
+        applied += _create_missing_indexes(connection, table, ["ix_message_user_id"])
+        return applied
+
+
+def upgrade_schema(engine: Optional[Engine] = None) -> List[str]:
+    if engine is None:
+        from app.database import engine
+    return upgrade_message_table(engine)
+
+
+def upgrade_shards() -> List[str]:
+    """Aplica los mismos cambios a la tabla `message` de cada shard."""
+    from app.messages.sharding import shard_router
+
+    applied = []
+    for name, engine in shard_router.engines.items():
+        applied += [f"{name}: {change}" for change in upgrade_message_table(engine)]
+    return applied
+
+
+def main() -> int:
+    applied = upgrade_schema() + upgrade_shards()
+    print("\n".join(applied) if applied else "El esquema ya está al día")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+# app/redis_client.py
+import time
+from typing import Callable, Optional
+
+from fastapi import Request
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.exceptions import RedisError
+
+from .config import settings
+
+
+class RedisUnavailable(Exception):
+    """Redis no respondió (error, timeout o circuito abierto)."""
+
+
+# =============================
+# Circuit breaker
+# =============================
+
+class CircuitBreaker:
+    """
+    Circuit breaker simple con tres estados:
+    - closed: las llamadas pasan a Redis.
+    - open: se cortan las llamadas hasta que pase `reset_timeout`.
+    - half_open: se deja pasar una llamada de prueba; si va bien se cierra.
+
+    Cuenta como fallo tanto un error como una llamada más lenta que `slow_threshold`.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        slow_threshold: float = 0.1,
+        reset_timeout: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.slow_threshold = slow_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self, latency: float) -> None:
+        # una llamada lanzada antes de abrirse el circuito no lo cierra:
+        # solo la prueba en half_open puede hacerlo
+        if self.state == self.OPEN:
+            return
+        if latency > self.slow_threshold:
+            self.record_failure()
+            return
+        self._failures = 0
+        self._state = self.CLOSED
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """La llamada terminó sin resultado (p. ej. se canceló): otra puede hacer de prueba."""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        if self.state == self.OPEN:
+            return
+        self._failures += 1
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            self._trip()
+
+    def _trip(self) -> None:
+        if self._state != self.OPEN:
+            self.trips += 1
+        self._state = self.OPEN
+        self._opened_at = self._clock()
+        self._failures = 0
+        self._probe_in_flight = False
+
+
+class RedisMetrics:
+    """Contadores y latencias (en ms) de las llamadas a Redis."""
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+        self.last_ms: Optional[float] = None
+        self.avg_ms: Optional[float] = None
+        self.max_ms = 0.0
+
+    def observe(self, latency: float, error: bool = False) -> None:
+        ms = latency * 1000
+        self.calls += 1
+        if error:
+            self.errors += 1
+        self.last_ms = ms
+        self.avg_ms = ms if self.avg_ms is None else self.alpha * ms + (1 - self.alpha) * self.avg_ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "last_ms": self.last_ms,
+            "avg_ms": self.avg_ms,
+            "max_ms": self.max_ms,
+        }
+
+
+# =============================
+# Cliente resiliente
+# =============================
+
+class ResilientRedis:
+    """
+    Envoltorio sobre un cliente `redis.asyncio` que pasa cada comando por el
+    circuit breaker. Los comandos se usan igual que en el cliente original
+    (`await redis.incr(key)`); si Redis falla o el circuito está abierto se
+    lanza `RedisUnavailable` para que el llamador use su modo degradado.
+    """
+
+    def __init__(self, client, breaker: Optional[CircuitBreaker] = None):
+        self.client = client
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = RedisMetrics()
+
+    @property
+    def available(self) -> bool:
+        return self.breaker.state != CircuitBreaker.OPEN
+
+    async def call(self, command: str, *args, **kwargs):
+        if not self.breaker.allow_request():
+            self.metrics.rejected += 1
+            raise RedisUnavailable("Circuito de Redis abierto")
+
+        start = time.perf_counter()
+        try:
+            result = await getattr(self.client, command)(*args, **kwargs)
+        except (RedisError, OSError) as exc:
+            self.metrics.observe(time.perf_counter() - start, error=True)
+            self.breaker.record_failure()
+            raise RedisUnavailable(str(exc)) from exc
+        except BaseException:
+            # cancelada (cliente desconectado, timeout del llamador...): no es un
+            # fallo de Redis, pero si era la llamada de prueba hay que liberarla
+            self.breaker.release_probe()
+            raise
+
+        latency = time.perf_counter() - start
+        self.metrics.observe(latency)
+        self.breaker.record_success(latency)
+        return result
+
+    def __getattr__(self, name: str):
+        async def _command(*args, **kwargs):
+            return await self.call(name, *args, **kwargs)
+        return _command
+
+    def status(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "trips": self.breaker.trips,
+            "latency": self.metrics.as_dict(),
+        }
+
+    async def close(self) -> None:
+        close = getattr(self.client, "aclose", None) or self.client.close
+        await close()
+
+
+def create_redis_client() -> ResilientRedis:
+    """Crea el cliente Redis compartido con pool acotado, timeouts y circuit breaker."""
+    pool = BlockingConnectionPool(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+        decode_responses=True,
+    )
+    breaker = CircuitBreaker(
+        failure_threshold=settings.REDIS_BREAKER_FAILURES,
+        slow_threshold=settings.REDIS_BREAKER_SLOW_MS / 1000,
+        reset_timeout=settings.REDIS_BREAKER_RESET_SECONDS,
+    )
+    return ResilientRedis(Redis(connection_pool=pool), breaker=breaker)
+
+
+def get_redis(request: Request) -> Optional[ResilientRedis]:
+    return getattr(request.app.state, "redis", None)
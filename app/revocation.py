@@ -0,0 +1,184 @@
+# app/revocation.py
+import asyncio
+import hashlib
+import math
+import time
+from typing import Iterable, Optional
+
+from fastapi import Request
+from redis.exceptions import RedisError
+
+from .config import settings
+from .redis_client import RedisUnavailable, ResilientRedis
+
+
+# =============================
+# Bloom filter
+# =============================
+
+class BloomFilter:
+    """
+    Bloom filter en un `bytearray`. Nunca da falsos negativos: si
+    `item not in bloom` el elemento seguro no fue añadido.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+# =============================
+# Lista de revocación
+# =============================
+
+class TokenRevocationList:
+    """
+    Lista de tokens revocados. La fuente de verdad está en Redis:
+    - `{prefix}:{item}` con TTL hasta que el token expira (consulta exacta),
+    - el sorted set `{prefix}` (score = expiración) para reconstruir el filtro,
+    - el canal pub/sub `REVOCATION_CHANNEL` para avisar al resto de workers.
+
+    Cada worker mantiene un `BloomFilter` espejo. Un token no revocado se
+    descarta con una sola comprobación en memoria; solo los positivos del
+    filtro se confirman contra Redis. Sin Redis se usa un registro local.
+
+    Se revoca por `jti` (logout) o por `sub` (usuario desactivado, invalida
+    todos sus tokens emitidos).
+    """
+
+    def __init__(self, redis: Optional[ResilientRedis] = None):
+        self.redis = redis
+        self.prefix = settings.REVOCATION_KEY_PREFIX
+        self.channel = settings.REVOCATION_CHANNEL
+        self.bloom = self._new_bloom()
+        self._local = {}
+        # revocaciones que no se pudieron escribir en Redis (se reenvían al reconstruir)
+        self._pending = {}
+        self._last_rebuild = time.monotonic()
+
+    @staticmethod
+    def _new_bloom() -> BloomFilter:
+        return BloomFilter(settings.REVOCATION_BLOOM_CAPACITY, settings.REVOCATION_BLOOM_ERROR_RATE)
+
+    @staticmethod
+    def _items(payload: dict) -> Iterable[str]:
+        if payload.get("jti"):
+            yield f"jti:{payload['jti']}"
+        if payload.get("sub"):
+            yield f"sub:{payload['sub']}"
+
+    async def revoke_token(self, payload: dict) -> None:
+        """Revoca un token concreto (por su `jti`) hasta su expiración."""
+        expires_at = int(payload.get("exp") or time.time() + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+        await self._revoke(f"jti:{payload['jti']}", expires_at)
+
+    async def revoke_subject(self, subject: str) -> None:
+        """Revoca todos los tokens emitidos para `subject` (vida máxima de un token)."""
+        await self._revoke(f"sub:{subject}", int(time.time()) + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+    async def _revoke(self, item: str, expires_at: int) -> None:
+        self.bloom.add(item)
+        self._local[item] = expires_at
+        if self.redis is None:
+            return
+        try:
+            await self._write(item, expires_at)
+        except RedisUnavailable:
+            # queda revocado en este worker; se reenvía a Redis (y al resto de
+            # workers) en la primera reconstrucción con Redis disponible
+            self._pending[item] = expires_at
+
+    async def _write(self, item: str, expires_at: int) -> None:
+        ttl = max(1, expires_at - int(time.time()))
+        await self.redis.set(f"{self.prefix}:{item}", "1", ex=ttl)
+        await self.redis.zadd(self.prefix, {item: expires_at})
+        await self.redis.publish(self.channel, item)
+
+    async def _replay_pending(self, now: int) -> None:
+        for item, expires_at in list(self._pending.items()):
+            if expires_at > now:
+                await self._write(item, expires_at)
+            del self._pending[item]
+
+    async def is_revoked(self, payload: dict) -> bool:
+        candidates = [item for item in self._items(payload) if item in self.bloom]
+        if not candidates:
+            return False
+
+        # lo revocado en este worker cuenta aunque Redis no lo tenga (caída)
+        now = time.time()
+        if any(self._local.get(item, 0) > now for item in candidates):
+            return True
+        if self.redis is None:
+            return False
+        try:
+            return bool(await self.redis.exists(*(f"{self.prefix}:{item}" for item in candidates)))
+        except RedisUnavailable:
+            # sin forma de confirmar el positivo: fallamos cerrado
+            return True
+
+    async def rebuild(self) -> None:
+        """Reconstruye el filtro desde Redis descartando entradas expiradas."""
+        now = int(time.time())
+        items = []
+        if self.redis is not None:
+            await self._replay_pending(now)
+            await self.redis.zremrangebyscore(self.prefix, "-inf", now)
+            items = await self.redis.zrange(self.prefix, 0, -1)
+        # las revocaciones locales se leen después de los await y sin ceder el
+        # control hasta el cambio de filtro: un logout durante la lectura de
+        # Redis no puede quedarse solo en el filtro viejo
+        self._local = {k: v for k, v in self._local.items() if v > now}
+        bloom = self._new_bloom()
+        for item in [*items, *self._local]:
+            bloom.add(item)
+        self.bloom = bloom
+        self._last_rebuild = time.monotonic()
+
+    async def listen(self) -> None:
+        """Tarea de fondo: sincroniza el filtro con las revocaciones de otros workers."""
+        while True:
+            pubsub = self.redis.client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                await self.rebuild()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message:
+                        self.bloom.add(message["data"])
+                    if time.monotonic() - self._last_rebuild >= settings.REVOCATION_REBUILD_SECONDS:
+                        await self.rebuild()
+            except asyncio.CancelledError:
+                raise
+            except (RedisError, RedisUnavailable, OSError):
+                await asyncio.sleep(1)
+            finally:
+                close = getattr(pubsub, "aclose", None) or pubsub.reset
+                await close()
+
+
+def get_revocations(request: Request) -> TokenRevocationList:
+    state = request.app.state
+    if getattr(state, "revocations", None) is None:
+        redis = getattr(state, "redis", None)
+        state.revocations = TokenRevocationList(redis if isinstance(redis, ResilientRedis) else None)
+    return state.revocations
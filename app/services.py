@@ -2,15 +2,24 @@
 
 from __future__ import annotations
 
-from typing import Annotated, Optional
+import json
+from typing import Annotated, Iterator, Optional
 from uuid import UUID
 
-from fastapi import Depends, status
+from fastapi import Depends, Request, status
+from fastapi.responses import JSONResponse
 from sqlmodel import Session
 
 from app.messages.schemas import MessageCreate
-from app.messages.crud import create_db_message, get_messages_by_session_id
-from .database import get_session
+from app.messages.crud import (
+    create_db_message,
+    get_messages_by_session_id,
+    get_messages_by_user_id,
+    get_session_validator,
+    iter_messages_by_session_id,
+)
+from app.messages.sharding import bind_for, merge_by_created_at, session_for, shard_router
+from .database import get_read_session, get_session
 
 
 # =============================
@@ -41,6 +50,19 @@ class ServiceError(Exception):
         self.http_status = http_status
 
 
+def service_error_response(exc: ServiceError, headers: Optional[dict] = None) -> JSONResponse:
+    """Respuesta JSON estándar de error para una `ServiceError`."""
+    body = {
+        "status": "error",
+        "error": {"code": exc.code, "message": exc.message, "details": exc.details},
+    }
+    return JSONResponse(status_code=exc.http_status, content=body, headers=headers)
+
+
+async def service_error_handler(request: Request, exc: ServiceError) -> JSONResponse:
+    return service_error_response(exc)
+
+
 # =============================
 # Servicio de Mensajes
 # =============================
@@ -98,20 +120,20 @@ class MessageService:
         word_count = len(message.content.split())
         message_length = len(message.content)
 
-        # 3) Persistencia
-        db_message = create_db_message(
-            session=self.session,
-            user_id=user_id,
-            session_id=message.session_id,
-            content=message.content,
-            sender=message.sender,
-            message_length=message_length,
-            word_count=word_count,
-        )
+        # 3) Persistencia (en el shard dueño de la sesión, si hay sharding)
+        with session_for(self.session, message.session_id) as session:
+            db_message = create_db_message(
+                session=session,
+                user_id=user_id,
+                session_id=message.session_id,
+                content=message.content,
+                sender=message.sender,
+                message_length=message_length,
+                word_count=word_count,
+            )
         return db_message
 
-    def get_messages(self, session_id: str, limit: int, offset: int, sender: Optional[str]):
-        """Obtiene mensajes usando el repositorio, con validación opcional de sender."""
+    def _validate_sender_filter(self, sender: Optional[str]) -> None:
         if sender is not None and sender not in ALLOWED_SENDERS:
             raise ServiceError(
                 code="INVALID_FILTER",
@@ -120,13 +142,46 @@ class MessageService:
                 http_status=status.HTTP_400_BAD_REQUEST,
             )
 
-        return get_messages_by_session_id(
-            session_id=session_id,
-            session=self.session,
-            limit=limit,
-            offset=offset,
-            sender=sender,
+    def get_messages(self, session_id: str, limit: int, offset: int, sender: Optional[str]):
+        """Obtiene mensajes usando el repositorio, con validación opcional de sender."""
+        self._validate_sender_filter(sender)
+        with session_for(self.session, session_id) as session:
+            return get_messages_by_session_id(
+                session_id=session_id,
+                session=session,
+                limit=limit,
+                offset=offset,
+                sender=sender,
+            )
+
+    def get_messages_validator(self, session_id: str, sender: Optional[str]):
+        """(conteo, último created_at) de la sesión, para ETag/Last-Modified."""
+        self._validate_sender_filter(sender)
+        with session_for(self.session, session_id) as session:
+            return get_session_validator(session=session, session_id=session_id, sender=sender)
+
+    def export_messages(self, session_id: str, sender: Optional[str]) -> Iterator[str]:
+        """Exporta los mensajes de una sesión como NDJSON, una línea por mensaje."""
+        self._validate_sender_filter(sender)
+        return self._export_lines(session_id, sender)
+
+    def _export_lines(self, session_id: str, sender: Optional[str]) -> Iterator[str]:
+        # el StreamingResponse consume el generador cuando la dependencia ya cerró
+        # self.session: se abre una sesión propia (mismo engine, o el del shard)
+        # que se cierra al terminar el streaming
+        with Session(bind_for(self.session, session_id)) as session:
+            for row in iter_messages_by_session_id(session=session, session_id=session_id, sender=sender):
+                yield json.dumps(row, ensure_ascii=False) + "\n"
+
+    def get_user_messages(self, user_id: UUID, limit: int, offset: int):
+        """Historial de un usuario; con sharding se consulta cada shard en paralelo y se combina."""
+        if not shard_router.enabled:
+            return get_messages_by_user_id(session=self.session, user_id=user_id, limit=limit, offset=offset)
+        # cada shard devuelve sus offset + limit más recientes; el corte se hace tras combinar
+        results = shard_router.fan_out(
+            lambda session: get_messages_by_user_id(session=session, user_id=user_id, limit=offset + limit)
         )
+        return merge_by_created_at(results, limit=limit, offset=offset)
 
 
 # =============================
@@ -135,3 +190,7 @@ class MessageService:
 
 def get_message_service(session: Annotated[Session, Depends(get_session)]):
     return MessageService(session=session)
+
+def get_message_reader_service(session: Annotated[Session, Depends(get_read_session)]):
+    """Servicio para rutas de solo lectura (puede ir contra una réplica)."""
+    return MessageService(session=session)
@@ -0,0 +1,247 @@
+#### importación masiva de Users
+# app/users/bulk_import.py
+"""
+Importación masiva de usuarios desde CSV o NDJSON.
+
+El fichero se lee en streaming y se procesa por lotes:
+1) validación de cada fila y duplicados dentro del propio fichero,
+2) una sola consulta por lote para detectar `username`/`email` ya registrados,
+3) hash de contraseñas repartido en un pool de procesos (bcrypt es CPU-bound),
+4) carga con `COPY` en PostgreSQL o `INSERT` por lotes en el resto de motores.
+
+Uso desde la línea de comandos:
+
+    python -m app.users.bulk_import usuarios.csv [--format ndjson] [--batch-size 1000] [--workers 8]
+"""
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.config import settings
+from .crud import hash_password
+from .models import User
+from .schemas import UserImportError, UserImportReport
+
+FORMATS = ("csv", "ndjson")
+REQUIRED_FIELDS = ("username", "email", "password")
+COPY_COLUMNS = ("id", "username", "email", "password_hash", "is_active", "full_name", "create_at")
+
+# (número de línea, fila, error de lectura)
+Row = Tuple[int, Optional[dict], Optional[str]]
+
+
+def detect_format(filename: Optional[str]) -> Optional[str]:
+    ext = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    if ext in ("jsonl", "json"):
+        return "ndjson"
+    return ext if ext in FORMATS else None
+
+
+def read_rows(stream: IO[str], fmt: str) -> Iterator[Row]:
+    """Lee el fichero fila a fila sin cargarlo entero en memoria."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+    elif fmt == "ndjson":
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield line_no, None, f"JSON inválido: {exc.msg}"
+                continue
+            if not isinstance(row, dict):
+                yield line_no, None, "Se esperaba un objeto JSON"
+                continue
+            yield line_no, row, None
+    else:
+        raise ValueError(f"Formato no soportado: {fmt!r} (usa {', '.join(FORMATS)})")
+
+
+def _clean(row: dict) -> dict:
+    return {key: str(row.get(key) or "").strip() for key in (*REQUIRED_FIELDS, "full_name")}
+
+
+def _validate(row: dict) -> Optional[str]:
+    missing = [field for field in REQUIRED_FIELDS if not row[field]]
+    if missing:
+        return f"Campos obligatorios vacíos: {', '.join(missing)}"
+    if "@" not in row["email"]:
+        return "Email inválido"
+    return None
+
+
+def _copy_records(session: Session, records: List[dict]) -> None:
+    """Carga los registros con `COPY ... FROM STDIN` (PostgreSQL)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for record in records:
+        writer.writerow([
+            record["id"], record["username"], record["email"], record["password_hash"],
+            "t", record["full_name"], record["create_at"].isoformat(),
+        ])
+    buffer.seek(0)
+    cursor = session.connection().connection.cursor()
+    cursor.copy_expert(
+        f'COPY "{User.__table__.name}" ({", ".join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)',
+        buffer,
+    )
+
+
+def _load(session: Session, records: List[dict]) -> None:
+    if session.get_bind().dialect.name == "postgresql":
+        _copy_records(session, records)
+    else:
+        session.execute(insert(User), records)
+
+
+def _load_batch(session: Session, lines: List[int], records: List[dict], report: UserImportReport) -> None:
+    # COPY va por el cursor del driver: sus errores no llegan envueltos por SQLAlchemy
+    driver_integrity_error = session.get_bind().dialect.dbapi.IntegrityError
+    try:
+        _load(session, records)
+        session.commit()
+        report.created += len(records)
+        return
+    except (IntegrityError, driver_integrity_error):
+        # alguien registró uno de estos usuarios entre la consulta y la carga
+        session.rollback()
+
+    for line, record in zip(lines, records):
+        try:
+            session.execute(insert(User), [record])
+            session.commit()
+            report.created += 1
+        except IntegrityError:
+            session.rollback()
+            report.errors.append(UserImportError(line=line, username=record["username"], error="Usuario o email ya registrado"))
+
+
+def _process_batch(session: Session, batch: List[Row], hasher, seen: dict, report: UserImportReport) -> None:
+    pending = []
+    for line, raw, error in batch:
+        row = _clean(raw) if raw is not None else None
+        error = error or _validate(row)
+        if not error:
+            if row["username"] in seen["username"]:
+                error = "Nombre de usuario repetido en el fichero"
+            elif row["email"] in seen["email"]:
+                error = "Email repetido en el fichero"
+        if error:
+            report.errors.append(UserImportError(line=line, username=row["username"] if row else None, error=error))
+            continue
+        seen["username"].add(row["username"])
+        seen["email"].add(row["email"])
+        pending.append((line, row))
+
+    if not pending:
+        return
+
+    # una sola consulta para todo el lote (incluye usuarios desactivados: la restricción UNIQUE también)
+    usernames = [row["username"] for _, row in pending]
+    emails = [row["email"] for _, row in pending]
+    existing = session.exec(
+        select(User.username, User.email).where(or_(User.username.in_(usernames), User.email.in_(emails)))
+    ).all()
+    taken_usernames = {username for username, _ in existing}
+    taken_emails = {email for _, email in existing}
+
+    valid = []
+    for line, row in pending:
+        if row["username"] in taken_usernames:
+            report.errors.append(UserImportError(line=line, username=row["username"], error="El nombre de usuario ya está registrado."))
+        elif row["email"] in taken_emails:
+            report.errors.append(UserImportError(line=line, username=row["username"], error="El email ya está registrado."))
+        else:
+            valid.append((line, row))
+
+    if not valid:
+        return
+
+    hashes = hasher([row["password"] for _, row in valid])
+    now = datetime.now(timezone.utc)
+    records = [
+        {
+            "id": uuid4(),
+            "username": row["username"],
+            "email": row["email"],
+            "password_hash": password_hash,
+            "is_active": True,
+            "full_name": row["full_name"] or None,
+            "create_at": now,
+        }
+        for (_, row), password_hash in zip(valid, hashes)
+    ]
+    _load_batch(session, [line for line, _ in valid], records, report)
+
+
+def import_users(session: Session, rows: Iterable[Row], batch_size: Optional[int] = None, workers: Optional[int] = None) -> UserImportReport:
+    """Importa usuarios por lotes y devuelve el informe con los errores por fila."""
+    batch_size = batch_size or settings.USER_IMPORT_BATCH_SIZE
+    workers = workers or settings.USER_IMPORT_WORKERS or os.cpu_count() or 1
+    report = UserImportReport()
+    seen = {"username": set(), "email": set()}
+    rows = iter(rows)
+
+    executor = None
+    if workers > 1:
+        # spawn: no heredar hilos/conexiones del servidor en los procesos hijos
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def hasher(passwords: List[str]) -> List[str]:
+        if executor is None:
+            return [hash_password(p) for p in passwords]
+        chunksize = max(1, len(passwords) // (workers * 4))
+        return list(executor.map(hash_password, passwords, chunksize=chunksize))
+
+    try:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            _process_batch(session, batch, hasher, seen, report)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from app.database import create_db_and_tables, engine
+
+    parser = argparse.ArgumentParser(description="Importación masiva de usuarios (CSV o NDJSON)")
+    parser.add_argument("path", help="fichero a importar ('-' para stdin)")
+    parser.add_argument("--format", choices=FORMATS, help="por defecto se deduce de la extensión")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or detect_format(args.path)
+    if fmt is None:
+        parser.error("no se pudo deducir el formato; usa --format")
+
+    create_db_and_tables()
+    stream = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8", newline="")
+    with stream, Session(engine) as session:
+        report = import_users(session, read_rows(stream, fmt), batch_size=args.batch_size, workers=args.workers)
+    print(report.model_dump_json(indent=2))
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
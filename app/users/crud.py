@@ -42,11 +42,12 @@ def update_user_db(user_id: UUID, user_update: UserUpdate, session: Session) ->
     session.refresh(user)
     return user
 
-def soft_delete_user_db(user_id: UUID, session: Session) -> bool:
+def soft_delete_user_db(user_id: UUID, session: Session) -> Optional[User]:
+    """Desactiva el usuario y lo devuelve para que el llamador revoque sus tokens."""
     user = session.get(User, user_id)
     if not user:
-        return False
+        return None
     user.is_active = False
     session.add(user)
     session.commit()
-    return True
+    return user
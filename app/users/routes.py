@@ -1,11 +1,17 @@
 #### routes de Users
 # app/users/routes.py
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Annotated
+import io
+
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Annotated, Optional
 from sqlmodel import Session
 
+from app.auth import require_admin
 from app.database import get_session
-from .schemas import UserCreate, UserUpdate, UserRead
+from app.revocation import TokenRevocationList, get_revocations
+from .schemas import UserCreate, UserUpdate, UserRead, UserImportReport
+from .bulk_import import detect_format, import_users, read_rows
 from .crud import create_user_db, update_user_db, soft_delete_user_db, get_user_by_username, verify_password
 from .models import User
 from app.users.auth import router as auth_router  # no usado aquí, auth se registra desde routes.init_routes
@@ -20,6 +26,14 @@ def create_user(user: UserCreate, session: Annotated[Session, Depends(get_sessio
     new_user = create_user_db(user, session)
     return new_user
 
+@router.post("/import", response_model=UserImportReport)
+def bulk_import_users(file: UploadFile, session: Annotated[Session, Depends(get_session)], admin: Annotated[User, Depends(require_admin)], format: Optional[str] = None):
+    fmt = format or detect_format(file.filename)
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Formato no soportado: usa 'csv' o 'ndjson'.")
+    stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    return import_users(session, read_rows(stream, fmt))
+
 @router.put("/{user_id}", response_model=UserRead)
 def update_user(user_id: str, user_update: UserUpdate, session: Annotated[Session, Depends(get_session)], current_user: Annotated[User, Depends(lambda: None)] = None):
     # current_user dependency can be connected to real get_current_user (see auth integration)
@@ -29,8 +43,10 @@ def update_user(user_id: str, user_update: UserUpdate, session: Annotated[Sessio
     return updated
 
 @router.delete("/{user_id}")
-def delete_user(user_id: str, session: Annotated[Session, Depends(get_session)], current_user: Annotated[User, Depends(lambda: None)] = None):
-    ok = soft_delete_user_db(user_id, session)
-    if not ok:
+async def delete_user(user_id: str, session: Annotated[Session, Depends(get_session)], revocations: Annotated[TokenRevocationList, Depends(get_revocations)], current_user: Annotated[User, Depends(lambda: None)] = None):
+    deleted = await run_in_threadpool(soft_delete_user_db, user_id, session)
+    if not deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado.")
+    # invalida los JWT que el usuario aún tenga en circulación
+    await revocations.revoke_subject(deleted.username)
     return {"status": "success"}
@@ -1,7 +1,7 @@
 ### schemas of Users
 from pydantic import BaseModel
 from uuid import UUID
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class UserCreate(BaseModel):
@@ -33,3 +33,14 @@ class UserRead(BaseModel):
 
     class Config:
         from_attributes = True  
+
+class UserImportError(BaseModel):
+    """Fila rechazada durante la importación masiva."""
+    line: int
+    username: Optional[str] = None
+    error: str
+
+class UserImportReport(BaseModel):
+    """Resultado de la importación masiva de usuarios."""
+    created: int = 0
+    errors: List[UserImportError] = []
@@ -0,0 +1,75 @@
+# benchmarks/message_compression.py
+"""
+Ahorro de almacenamiento y coste de CPU por mensaje de la compresión de contenido.
+
+    python -m benchmarks.message_compression [n_mensajes]
+"""
+import random
+import sys
+import time
+
+from app.config import settings
+from app.messages import compression
+
+LOG_LINES = [
+    "2024-05-01T10:{m:02d}:{s:02d}Z INFO  worker-{w} request_id={r} GET /messages/abc status=200 took={t}ms",
+    "2024-05-01T10:{m:02d}:{s:02d}Z WARN  worker-{w} request_id={r} slow query on message table took={t}ms",
+    "2024-05-01T10:{m:02d}:{s:02d}Z ERROR worker-{w} request_id={r} Traceback (most recent call last): redis timeout after {t}ms",
+]
+
+
+def sample_message(rng: random.Random, size: int) -> str:
+    lines = []
+    while sum(len(line) + 1 for line in lines) < size:
+        template = rng.choice(LOG_LINES)
+        lines.append(template.format(
+            m=rng.randrange(60), s=rng.randrange(60), w=rng.randrange(8),
+            r=rng.getrandbits(48), t=rng.randrange(2000),
+        ))
+    return "\n".join(lines)
+
+
+def run(codec: str, messages: list) -> dict:
+    settings.MESSAGE_COMPRESSION = codec
+    raw_bytes = stored_bytes = 0
+    blobs = []
+
+    start = time.perf_counter()
+    for content in messages:
+        blobs.append(compression.compress_content(content))
+    compress_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for content, blob in zip(messages, blobs):
+        compression.message_content(content, blob)
+    decompress_s = time.perf_counter() - start
+
+    for content, blob in zip(messages, blobs):
+        raw_bytes += len(content.encode("utf-8"))
+        stored_bytes += len(blob) if blob is not None else len(content.encode("utf-8"))
+    return {
+        "codec": codec,
+        "ratio": stored_bytes / raw_bytes,
+        "saved_pct": 100 * (1 - stored_bytes / raw_bytes),
+        "compress_us": compress_s / len(messages) * 1e6,
+        "decompress_us": decompress_s / len(messages) * 1e6,
+    }
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rng = random.Random(42)
+    for size in (512, 4096, 32768):
+        messages = [sample_message(rng, size) for _ in range(n)]
+        codecs = ["zlib"] + (["zstd"] if compression.zstandard is not None else [])
+        for codec in codecs:
+            r = run(codec, messages)
+            print(
+                f"size={size:>6}B codec={r['codec']:<4} stored={r['ratio']:.3f}x "
+                f"saved={r['saved_pct']:5.1f}% compress={r['compress_us']:7.1f}us/msg "
+                f"decompress={r['decompress_us']:7.1f}us/msg"
+            )
+
+
+if __name__ == "__main__":
+    main()
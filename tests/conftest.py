@@ -1,11 +1,12 @@
 import pytest
 from sqlmodel import create_engine, SQLModel, Session
+from sqlmodel.pool import StaticPool
 from fastapi.testclient import TestClient
-import fakeredis
+import fakeredis.aioredis
 
 from app.main import app
 from app.database import get_session
-from app.middleware import RedisRateLimitMiddleware
+from app.redis_client import ResilientRedis
 
 # Usamos SQLite en memoria para los tests
 sqlite_url = "sqlite:///:memory:"
@@ -22,6 +23,20 @@ def session_fixture():
         yield session
     SQLModel.metadata.drop_all(engine)
 
+@pytest.fixture(name="memory_engine")
+def memory_engine_fixture():
+    """Engine SQLite en memoria propio de cada test, compartido entre hilos (StaticPool)."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture(name="memory_session")
+def memory_session_fixture(memory_engine):
+    """Sesión sobre `memory_engine`."""
+    with Session(memory_engine) as session:
+        yield session
+
 @pytest.fixture(name="client")
 def client_fixture(session: Session):
     """Fixture para cliente de pruebas con Redis simulado."""
@@ -31,15 +46,11 @@ def client_fixture(session: Session):
 
     app.dependency_overrides[get_session] = get_session_override
 
-    # Redis simulado con fakeredis
-    fake_redis = fakeredis.FakeStrictRedis()
-    app.state.redis = fake_redis
-
-    # Inyectar el middleware con Redis falso
-    app.user_middleware.clear()
-    app.add_middleware(RedisRateLimitMiddleware, redis_client=fake_redis)
+    # Redis simulado con fakeredis (cliente asyncio, como el de la app); el
+    # middleware de rate limit de app.main lo lee de app.state en cada petición
+    app.state.redis = ResilientRedis(fakeredis.aioredis.FakeRedis(decode_responses=True))
 
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
-s
\ No newline at end of file
+    app.state.redis = None
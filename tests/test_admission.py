@@ -0,0 +1,71 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.middlewares.admission import AdmissionControlMiddleware, AdmissionLimiter, Overloaded
+
+
+def test_limiter_queues_and_rejects():
+    """Con el límite y la cola llenos se rechaza; al liberar pasa el siguiente."""
+    async def scenario():
+        limiter = AdmissionLimiter("read", limit=1, max_queue=1, queue_timeout=1)
+        await limiter.acquire()
+        queued = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            await limiter.acquire()
+        limiter.release()
+        await queued
+        assert limiter.status() == {"limit": 1, "in_flight": 1, "queued": 0, "rejected": 1}
+
+    asyncio.run(scenario())
+
+
+def test_limiter_queue_deadline():
+    """Una petición en cola se rechaza al vencer su plazo."""
+    async def scenario():
+        limiter = AdmissionLimiter("write", limit=1, max_queue=5, queue_timeout=0.01)
+        await limiter.acquire()
+        with pytest.raises(Overloaded):
+            await limiter.acquire()
+        assert limiter.status()["queued"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_limiter_aimd():
+    """El límite crece con latencias bajas y se reduce con latencias altas."""
+    limiter = AdmissionLimiter("read", limit=10, adaptive=True, target_latency=0.1, max_limit=20)
+    limiter.in_flight = 30
+    for _ in range(30):
+        limiter.release(0.01)
+    assert limiter.capacity == 12
+    limiter.in_flight = 1
+    limiter.release(1.0)
+    assert limiter.capacity == 11
+
+
+def test_middleware_sheds_with_service_error_shape():
+    """Las peticiones que no caben reciben 503 con Retry-After y el JSON de ServiceError."""
+    app = FastAPI()
+    limiters = {"read": AdmissionLimiter("read", limit=1, max_queue=0)}
+    app.add_middleware(AdmissionControlMiddleware, limiters=limiters)
+
+    @app.get("/slow")
+    async def slow():
+        await asyncio.sleep(0.1)
+        return {"ok": True}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(client.get("/slow"), client.get("/slow"))
+
+    responses = asyncio.run(scenario())
+    assert sorted(r.status_code for r in responses) == [200, 503]
+    rejected = next(r for r in responses if r.status_code == 503)
+    assert rejected.headers["Retry-After"] == "1"
+    assert rejected.json()["status"] == "error"
+    assert rejected.json()["error"]["code"] == "SERVICE_OVERLOADED"
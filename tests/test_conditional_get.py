@@ -0,0 +1,82 @@
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.database import get_session
+from app.main import app
+from app.messages.models import Message
+
+
+@pytest.fixture(name="api")
+def api_fixture(memory_engine):
+    def get_session_override():
+        with Session(memory_engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = get_session_override
+    yield TestClient(app), memory_engine
+    app.dependency_overrides.clear()
+
+
+def add_message(engine, session_id: str, created_at: datetime):
+    with Session(engine) as session:
+        session.add(Message(session_id=session_id, user_id=uuid4(), content="hola", sender="user",
+                            message_length=4, word_count=1, created_at=created_at))
+        session.commit()
+
+
+def test_etag_and_not_modified(api, monkeypatch):
+    """Con If-None-Match vigente responde 304 sin cargar las filas."""
+    client, engine = api
+    response = client.get("/messages/s1")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    # otros parámetros, otra representación
+    assert client.get("/messages/s1?limit=10").headers["ETag"] != etag
+
+    def fail(*args, **kwargs):
+        raise AssertionError("no debe cargar mensajes en un 304")
+    monkeypatch.setattr("app.services.get_messages_by_session_id", fail)
+
+    response = client.get("/messages/s1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+
+def test_validator_changes_after_new_message(api, monkeypatch):
+    """Un mensaje nuevo invalida el ETag y actualiza Last-Modified."""
+    client, engine = api
+    # solo interesan las cabeceras; evitamos serializar las filas
+    monkeypatch.setattr("app.services.get_messages_by_session_id", lambda **kwargs: [])
+    add_message(engine, "s1", datetime(2024, 5, 1, 10, 0))
+    first = client.get("/messages/s1", headers={"If-None-Match": 'W/"otro"'})
+    assert first.status_code == 200
+    etag, last_modified = first.headers["ETag"], first.headers["Last-Modified"]
+    assert last_modified == "Wed, 01 May 2024 10:00:00 GMT"
+
+    # solo el ETag decide el 304 (If-Modified-Since no distingue mensajes del mismo segundo)
+    assert client.get("/messages/s1", headers={"If-Modified-Since": last_modified}).status_code == 200
+    assert client.get("/messages/s1", headers={"If-None-Match": etag}).status_code == 304
+
+    add_message(engine, "s1", datetime(2024, 5, 1, 11, 0))
+    response = client.get("/messages/s1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.headers["Last-Modified"] == "Wed, 01 May 2024 11:00:00 GMT"
+
+
+def test_message_in_same_second_is_not_hidden(api, monkeypatch):
+    """Un mensaje nuevo en el mismo segundo que el último visto no da 304."""
+    client, engine = api
+    monkeypatch.setattr("app.services.get_messages_by_session_id", lambda **kwargs: [])
+    add_message(engine, "s1", datetime(2024, 5, 1, 10, 0, 0, 100000))
+    first = client.get("/messages/s1")
+    etag, last_modified = first.headers["ETag"], first.headers["Last-Modified"]
+
+    add_message(engine, "s1", datetime(2024, 5, 1, 10, 0, 0, 900000))
+    assert client.get("/messages/s1", headers={"If-None-Match": etag}).status_code == 200
+    assert client.get("/messages/s1", headers={"If-Modified-Since": last_modified}).status_code == 200
@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.messages.analytics import AnalyticsCache, MessageAnalyticsService, aggregate_range
+from app.messages.models import Message
+from app.services import ServiceError
+
+START = datetime(2024, 5, 1, 10, 0)
+
+
+@pytest.fixture(name="db")
+def db_fixture(memory_session):
+    ana, pedro = uuid4(), uuid4()
+    for i in range(100):
+        memory_session.add(Message(
+            session_id="s1",
+            user_id=ana if i % 4 else pedro,
+            content="x" * (i + 1),
+            created_at=START + timedelta(minutes=3 * i),
+            sender="user" if i % 2 else "system",
+            message_length=i + 1,
+            word_count=1,
+        ))
+    memory_session.commit()
+    return memory_session, ana, pedro
+
+
+def test_summary_matches_numpy(db):
+    """Los conteos y percentiles deben coincidir con el cálculo directo."""
+    session, ana, pedro = db
+    service = MessageAnalyticsService(session, AnalyticsCache())
+    result = asyncio.run(service.summary(START, START + timedelta(hours=5), top_users=1))
+
+    assert result["total_messages"] == 100
+    assert [b["count"] for b in result["by_hour"]] == [20, 20, 20, 20, 20]
+    assert result["by_sender"] == {"user": 50, "system": 50}
+    assert result["top_users"] == [{"user_id": str(ana), "count": 75}]
+    assert result["message_length"]["mean"] == pytest.approx(50.5)
+    assert sum(result["message_length"]["histogram"]["counts"]) == 100
+    lengths = np.arange(1, 101)
+    for q in (50, 90, 99):
+        expected = np.percentile(lengths, q)
+        assert result["message_length"]["percentiles"][f"p{q}"] == pytest.approx(expected, rel=0.1)
+
+
+def test_closed_buckets_are_cached(db, monkeypatch):
+    """Una segunda consulta solo recalcula los buckets no cacheados."""
+    session, _, _ = db
+    cache = AnalyticsCache()
+    service = MessageAnalyticsService(session, cache)
+    asyncio.run(service.summary(START, START + timedelta(hours=5)))
+
+    calls = []
+    def tracking_aggregate(*args, **kwargs):
+        calls.append(args[1:])
+        return aggregate_range(*args, **kwargs)
+    monkeypatch.setattr("app.messages.analytics.aggregate_range", tracking_aggregate)
+
+    result = asyncio.run(service.summary(START + timedelta(minutes=30), START + timedelta(hours=5)))
+    # solo la primera hora (parcial) se vuelve a consultar
+    assert calls == [(START + timedelta(minutes=30), START + timedelta(hours=1))]
+    assert result["total_messages"] == 90
+
+
+def test_invalid_range(db):
+    session, _, _ = db
+    service = MessageAnalyticsService(session, AnalyticsCache())
+    with pytest.raises(ServiceError):
+        asyncio.run(service.summary(START, START - timedelta(hours=1)))
+
+
+def test_recently_closed_buckets_are_not_cached(memory_session, monkeypatch):
+    """Una hora cerrada hace menos del margen no se cachea (pueden llegar filas tarde)."""
+    monkeypatch.setattr(settings, "ANALYTICS_CACHE_GRACE_SECONDS", 2 * 3600)
+    hour = datetime.now(timezone.utc).replace(tzinfo=None, minute=0, second=0, microsecond=0)
+    start = hour - timedelta(hours=4)
+
+    cache = AnalyticsCache()
+    asyncio.run(MessageAnalyticsService(memory_session, cache).summary(start, hour))
+    cached = asyncio.run(cache.get_many([start + timedelta(hours=i) for i in range(4)]))
+    assert sorted(cached) == [start, start + timedelta(hours=1)]
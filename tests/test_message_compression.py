@@ -0,0 +1,71 @@
+import json
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel
+
+from app.config import settings
+from app.database import get_session, make_engine
+from app.main import app
+from app.messages.crud import create_db_message, get_messages_by_session_id, iter_messages_by_session_id
+from app.services import MessageService
+from app.messages.schemas import MessageCreate
+
+
+@pytest.fixture(name="db")
+def db_fixture(monkeypatch, memory_session):
+    monkeypatch.setattr(settings, "MESSAGE_COMPRESSION", "zlib")
+    monkeypatch.setattr(settings, "MESSAGE_COMPRESSION_THRESHOLD", 256)
+    return memory_session
+
+
+def test_large_content_is_compressed_transparently(db):
+    """Los mensajes grandes se guardan comprimidos y se leen como texto original."""
+    content = "linea de log repetida\n" * 200
+    service = MessageService(session=db)
+    msg = service.process_and_create_message(uuid4(), MessageCreate(session_id="s1", content=content, sender="system"))
+
+    assert msg.content_blob is not None
+    assert len(msg.content_blob) < len(content)
+    assert msg.content == content
+    assert msg.message_length == len(content)
+    assert msg.word_count == len(content.split())
+
+    db.expunge_all()
+    [stored] = get_messages_by_session_id(session=db, session_id="s1")
+    assert stored.content == content
+    assert stored not in db.dirty
+
+    [exported] = list(iter_messages_by_session_id(session=db, session_id="s1"))
+    assert exported["content"] == content
+
+
+def test_small_content_is_stored_as_text(db):
+    """Por debajo del umbral el contenido queda en texto plano."""
+    msg = create_db_message(db, uuid4(), "s2", "hola", "user", 4, 1)
+    assert msg.content_blob is None
+    assert msg.content == "hola"
+
+
+def test_export_streams_with_its_own_session(tmp_path):
+    """La exportación no reutiliza la sesión ya cerrada de la dependencia ni deja conexiones abiertas."""
+    engine = make_engine(f"sqlite:///{tmp_path / 'export.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        for i in range(3):
+            create_db_message(session, uuid4(), "s1", f"mensaje {i}", "user", 9, 2)
+
+    def get_session_override():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = get_session_override
+    try:
+        response = TestClient(app).get("/messages/s1/export")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert [json.loads(line)["content"] for line in response.text.splitlines()] == [f"mensaje {i}" for i in range(3)]
+    assert engine.pool.checkedout() == 0
@@ -0,0 +1,59 @@
+from datetime import datetime
+from uuid import uuid4
+
+import sqlalchemy as sa
+from sqlmodel import Session, select
+
+import app.messages.sharding as sharding
+from app.database import make_engine
+from app.messages.models import Message
+from app.messages.sharding import ShardRouter, create_shard_tables
+from app.migrations import upgrade_schema
+
+
+def create_legacy_message_table(engine) -> None:
+    """Tabla `message` tal como la creaba la versión sin compresión ni índices nuevos."""
+    metadata = sa.MetaData()
+    sa.Table(
+        "message", metadata,
+        *[sa.Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable)
+          for c in Message.__table__.columns if c.name != "content_blob"],
+    )
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(metadata.tables["message"].insert(), [{
+            "message_id": str(uuid4()), "session_id": "s1", "user_id": uuid4(), "content": "hola",
+            "sender": "user", "message_length": 4, "word_count": 1, "created_at": datetime(2024, 5, 1, 10, 0),
+        }])
+
+
+def test_upgrade_adds_new_columns_and_indexes_to_existing_table(tmp_path):
+    """Una base de datos anterior sigue siendo legible tras actualizar el esquema."""
+    engine = make_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    create_legacy_message_table(engine)
+
+    applied = upgrade_schema(engine)
+    assert "message.content_blob" in applied
+    assert "ix_message_session_id_created_at" in applied
+    assert "ix_message_user_id" in applied
+    assert upgrade_schema(engine) == []  # idempotente
+    indexes = {i["name"] for i in sa.inspect(engine).get_indexes("message")}
+    assert {"ix_message_session_id_created_at", "ix_message_user_id"} <= indexes
+
+    with Session(engine) as session:
+        [message] = session.exec(select(Message)).all()
+    assert message.content == "hola"
+    assert message.content_blob is None
+
+
+def test_shard_tables_are_upgraded(tmp_path, monkeypatch):
+    """Un shard con la tabla antigua recibe la columna y los índices al arrancar."""
+    shard = make_engine(f"sqlite:///{tmp_path / 'shard0.db'}")
+    create_legacy_message_table(shard)
+    monkeypatch.setattr(sharding, "shard_router", ShardRouter({"shard0": shard}))
+
+    create_shard_tables()
+    columns = {c["name"] for c in sa.inspect(shard).get_columns("message")}
+    indexes = {i["name"] for i in sa.inspect(shard).get_indexes("message")}
+    assert "content_blob" in columns
+    assert "ix_message_user_id" in indexes
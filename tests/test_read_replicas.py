@@ -0,0 +1,80 @@
+from typing import Annotated
+from uuid import uuid4
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, func, select
+
+import app.database as database
+from app.database import ReplicaRouter, get_read_session, get_session, make_engine
+from app.messages.models import Message
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def add_message(session: Session) -> None:
+    session.add(Message(session_id="s1", user_id=uuid4(), content="hola", sender="user", message_length=4, word_count=1))
+    session.commit()
+
+
+@pytest.fixture(name="setup")
+def setup_fixture(tmp_path, monkeypatch):
+    """Primario y réplica en dos ficheros SQLite; la réplica empieza vacía (con retraso)."""
+    primary = make_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = make_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    for engine in (primary, replica):
+        SQLModel.metadata.create_all(engine)
+    with Session(primary) as session:
+        add_message(session)
+
+    clock = FakeClock()
+    router = ReplicaRouter([replica], sticky_seconds=5, clock=clock)
+    monkeypatch.setattr(database, "engine", primary)
+    monkeypatch.setattr(database, "replica_router", router)
+
+    app = FastAPI()
+
+    @app.get("/count")
+    def count(session: Annotated[Session, Depends(get_read_session)]):
+        return session.exec(select(func.count()).select_from(Message)).one()
+
+    @app.post("/write")
+    def write(session: Annotated[Session, Depends(get_session)]):
+        add_message(session)
+
+    yield TestClient(app), clock
+
+
+def test_reads_use_replica_until_client_writes(setup):
+    """Tras escribir, el mismo cliente lee del primario durante la ventana sticky."""
+    client, clock = setup
+    alice = {"Authorization": "Bearer alice"}
+    bob = {"Authorization": "Bearer bob"}
+
+    assert client.get("/count", headers=alice).json() == 0  # réplica
+    client.post("/write", headers=alice)
+    assert client.get("/count", headers=alice).json() == 2  # primario (lee su escritura)
+    assert client.get("/count", headers=bob).json() == 0    # otros clientes siguen en la réplica
+
+    clock.now = 6
+    assert client.get("/count", headers=alice).json() == 0
+
+
+def test_round_robin_and_least_connections(tmp_path):
+    a, b = make_engine(f"sqlite:///{tmp_path / 'a.db'}"), make_engine(f"sqlite:///{tmp_path / 'b.db'}")
+    router = ReplicaRouter([a, b])
+    assert [router.choose() for _ in range(4)] == [a, b, a, b]
+
+    router = ReplicaRouter([a, b], strategy="least_connections")
+    with a.connect():
+        assert router.choose() is b
+
+    with pytest.raises(ValueError):
+        ReplicaRouter([a], strategy="random")
@@ -0,0 +1,155 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.middlewares.rate_limit import RedisRateLimitMiddleware
+from app.redis_client import CircuitBreaker, RedisUnavailable, ResilientRedis
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class BrokenRedis:
+    async def incr(self, key):
+        raise RedisConnectionError("down")
+
+
+def test_breaker_trips_on_errors_and_recovers():
+    """Debe abrirse tras N fallos y cerrarse tras una prueba exitosa."""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, slow_threshold=0.1, reset_timeout=5, clock=clock)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+
+    clock.now = 5
+    assert breaker.state == "half_open"
+    assert breaker.allow_request()
+    assert not breaker.allow_request()  # solo una llamada de prueba
+    breaker.record_success(0.01)
+    assert breaker.state == "closed"
+
+
+def test_late_results_do_not_close_open_breaker():
+    """Con el circuito abierto se ignoran resultados de llamadas anteriores."""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=clock)
+    breaker.record_failure()
+    breaker.record_success(0.01)
+    assert breaker.state == "open"
+    breaker.record_failure()
+    assert breaker.trips == 1
+
+    clock.now = 5
+    assert breaker.allow_request()
+    breaker.record_success(0.01)
+    assert breaker.state == "closed"
+
+
+def test_breaker_trips_on_latency():
+    """Las llamadas lentas cuentan como fallos."""
+    breaker = CircuitBreaker(failure_threshold=2, slow_threshold=0.1, clock=FakeClock())
+    breaker.record_success(0.5)
+    breaker.record_success(0.5)
+    assert breaker.state == "open"
+    assert breaker.trips == 1
+
+
+def test_resilient_redis_raises_unavailable():
+    """Los errores de Redis se traducen en RedisUnavailable y abren el circuito."""
+    redis = ResilientRedis(BrokenRedis(), CircuitBreaker(failure_threshold=1, clock=FakeClock()))
+    with pytest.raises(RedisUnavailable):
+        asyncio.run(redis.incr("k"))
+    with pytest.raises(RedisUnavailable):
+        asyncio.run(redis.incr("k"))
+    status = redis.status()
+    assert status["state"] == "open"
+    assert status["latency"]["errors"] == 1
+    assert status["latency"]["rejected"] == 1
+
+
+def test_rate_limit_degraded_mode():
+    """Con Redis caído el rate limit sigue funcionando en memoria."""
+    app = FastAPI()
+    redis = ResilientRedis(BrokenRedis(), CircuitBreaker(failure_threshold=1, clock=FakeClock()))
+    app.add_middleware(RedisRateLimitMiddleware, redis_client=redis, rate_limit=2, time_window=60)
+
+    @app.get("/ping")
+    def ping():
+        return {"ok": True}
+
+    client = TestClient(app)
+    for _ in range(2):
+        response = client.get("/ping")
+        assert response.status_code == 200
+        assert response.headers["X-RateLimit-Mode"] == "degraded"
+    assert client.get("/ping").status_code == 429
+
+
+def test_cancelled_probe_releases_half_open():
+    """Si la llamada de prueba se cancela, el circuito puede volver a probar."""
+    class HangingRedis:
+        async def incr(self, key):
+            await asyncio.sleep(3600)
+
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=clock)
+    redis = ResilientRedis(HangingRedis(), breaker)
+    breaker.record_failure()
+    clock.now = 5
+
+    async def cancel_probe():
+        task = asyncio.create_task(redis.incr("k"))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_probe())
+    assert breaker.state == "half_open"
+    assert breaker.allow_request()
+
+
+def test_rate_limit_key_gets_ttl_after_failed_expire():
+    """Si EXPIRE falla, la siguiente petición pone el TTL que faltaba."""
+    class FlakyExpireRedis:
+        def __init__(self):
+            self.values, self.ttls, self.fail_expire = {}, {}, True
+
+        async def incr(self, key):
+            self.values[key] = self.values.get(key, 0) + 1
+            return self.values[key]
+
+        async def ttl(self, key):
+            return self.ttls.get(key, -1)
+
+        async def expire(self, key, seconds):
+            if self.fail_expire:
+                self.fail_expire = False
+                raise RedisConnectionError("timeout")
+            self.ttls[key] = seconds
+
+    fake = FlakyExpireRedis()
+    app = FastAPI()
+    redis = ResilientRedis(fake, CircuitBreaker(failure_threshold=5, clock=FakeClock()))
+    app.add_middleware(RedisRateLimitMiddleware, redis_client=redis, rate_limit=10, time_window=60)
+
+    @app.get("/ping")
+    def ping():
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert client.get("/ping").headers["X-RateLimit-Mode"] == "degraded"
+    response = client.get("/ping")
+    assert response.headers["X-RateLimit-Mode"] == "redis"
+    assert fake.ttls == {"rl:testclient": 60}
@@ -0,0 +1,130 @@
+import asyncio
+from datetime import timedelta
+from typing import Annotated
+
+from fakeredis import aioredis
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.auth import create_access_token, get_token_payload
+from app.redis_client import CircuitBreaker, ResilientRedis
+from app.revocation import BloomFilter, TokenRevocationList
+from app.users.auth import router as auth_router
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Todo elemento añadido debe aparecer en el filtro."""
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [f"jti:{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    false_positives = sum(f"otro:{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_revoke_subject_with_redis():
+    """La revocación por usuario se confirma contra Redis y llega a otro worker."""
+    async def scenario():
+        redis = ResilientRedis(aioredis.FakeRedis(decode_responses=True))
+        worker_a = TokenRevocationList(redis)
+        worker_b = TokenRevocationList(redis)
+        payload = {"sub": "ana", "jti": "abc", "exp": 4102444800}
+
+        assert not await worker_a.is_revoked(payload)
+        await worker_a.revoke_subject("ana")
+        assert await worker_a.is_revoked(payload)
+
+        # worker_b aún no recibió el aviso; al reconstruir lo ve
+        assert not await worker_b.is_revoked(payload)
+        await worker_b.rebuild()
+        assert await worker_b.is_revoked(payload)
+        assert not await worker_b.is_revoked({"sub": "pedro", "jti": "xyz"})
+
+    asyncio.run(scenario())
+
+
+def test_logout_revokes_token():
+    """Tras /logout el mismo token debe ser rechazado."""
+    app = FastAPI()
+    app.include_router(auth_router)
+
+    @app.get("/me")
+    async def me(payload: Annotated[dict, Depends(get_token_payload)]):
+        return {"sub": payload["sub"]}
+
+    client = TestClient(app)
+    token = create_access_token({"sub": "laura"}, timedelta(minutes=5))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/me", headers=headers).status_code == 200
+    assert client.post("/logout", headers=headers).status_code == 200
+    assert client.get("/me", headers=headers).status_code == 401
+
+    other = create_access_token({"sub": "laura"}, timedelta(minutes=5))
+    assert client.get("/me", headers={"Authorization": f"Bearer {other}"}).status_code == 200
+
+
+def test_rebuild_keeps_revocations_made_while_reading_redis():
+    """Un logout en el mismo worker durante la reconstrucción no se pierde."""
+    class SlowZrange:
+        def __init__(self, inner):
+            self.inner = inner
+            self.reading = asyncio.Event()
+            self.release = asyncio.Event()
+
+        def __getattr__(self, name):
+            return getattr(self.inner, name)
+
+        async def zrange(self, *args, **kwargs):
+            result = await self.inner.zrange(*args, **kwargs)
+            self.reading.set()
+            await self.release.wait()
+            return result
+
+    async def scenario():
+        client = SlowZrange(aioredis.FakeRedis(decode_responses=True))
+        worker = TokenRevocationList(ResilientRedis(client))
+        payload = {"sub": "ana", "jti": "abc", "exp": 4102444800}
+
+        rebuild = asyncio.create_task(worker.rebuild())
+        await client.reading.wait()
+        await worker.revoke_token(payload)  # su ZADD llega después del ZRANGE
+        client.release.set()
+        await rebuild
+
+        assert "jti:abc" in worker.bloom
+        assert await worker.is_revoked(payload)
+
+    asyncio.run(scenario())
+
+
+def test_revocation_during_outage_survives_recovery():
+    """Un logout con Redis caído sigue vigente al recuperarse y llega a los demás workers."""
+    class FakeClock:
+        now = 0.0
+
+        def __call__(self):
+            return self.now
+
+    async def scenario():
+        clock = FakeClock()
+        fake = aioredis.FakeRedis(decode_responses=True)
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=clock)
+        worker_a = TokenRevocationList(ResilientRedis(fake, breaker))
+        worker_b = TokenRevocationList(ResilientRedis(fake))
+        payload = {"sub": "ana", "jti": "abc", "exp": 4102444800}
+
+        breaker.record_failure()  # Redis caído: circuito abierto
+        await worker_a.revoke_token(payload)
+        assert await worker_a.is_revoked(payload)
+
+        clock.now = 5  # Redis vuelve
+        assert await worker_a.is_revoked(payload)
+        await worker_a.rebuild()  # reenvía la revocación pendiente
+        assert await fake.zscore(worker_a.prefix, "jti:abc") == 4102444800
+
+        await worker_b.rebuild()
+        assert await worker_b.is_revoked(payload)
+
+    asyncio.run(scenario())
@@ -0,0 +1,197 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, func, select
+
+import app.messages.analytics as analytics
+import app.messages.sharding as sharding
+import app.services as services
+from app.database import get_session, make_engine
+from app.main import app
+from app.messages.analytics import AnalyticsCache, MessageAnalyticsService
+from app.messages.models import Message
+from app.messages.schemas import MessageCreate
+from app.messages.sharding import ConsistentHashRing, ShardRouter, create_shard_tables, rebalance
+from app.services import MessageService
+
+START = datetime(2024, 5, 1, 10, 0)
+
+
+def make_router(tmp_path, names, monkeypatch=None) -> ShardRouter:
+    router = ShardRouter({name: make_engine(f"sqlite:///{tmp_path / name}.db") for name in names}, vnodes=64)
+    if monkeypatch is not None:
+        for module in (sharding, services, analytics):
+            monkeypatch.setattr(module, "shard_router", router)
+    return router
+
+
+def count(engine, **filters) -> int:
+    statement = select(func.count()).select_from(Message).filter_by(**filters)
+    with Session(engine) as session:
+        return session.exec(statement).one()
+
+
+@pytest.fixture(name="router")
+def router_fixture(tmp_path, monkeypatch):
+    router = make_router(tmp_path, ["shard0", "shard1", "shard2"], monkeypatch)
+    create_shard_tables()
+    return router
+
+
+def test_ring_moves_only_a_fraction_when_adding_a_shard():
+    """Con un shard más, solo ~1/N de las sesiones cambian de dueño."""
+    keys = [f"session-{i}" for i in range(5000)]
+    before = ConsistentHashRing(["shard0", "shard1", "shard2"])
+    after = ConsistentHashRing(["shard0", "shard1", "shard2", "shard3"])
+
+    moved = [k for k in keys if before.node_for(k) != after.node_for(k)]
+    assert 0.15 < len(moved) / len(keys) < 0.35
+    assert all(after.node_for(k) == "shard3" for k in moved)
+
+
+def test_messages_go_to_owner_shard(router):
+    """Crear y leer una sesión toca únicamente su shard."""
+    service = MessageService(session=None)
+    for session_id in ("a", "b", "c", "d"):
+        for _ in range(2):
+            service.process_and_create_message(uuid4(), MessageCreate(session_id=session_id, content="hola", sender="user"))
+
+    for session_id in ("a", "b", "c", "d"):
+        owner = router.shard_for(session_id)
+        for name, engine in router.engines.items():
+            assert count(engine, session_id=session_id) == (2 if name == owner else 0)
+        assert len(service.get_messages(session_id, limit=10, offset=0, sender=None)) == 2
+        assert service.get_messages_validator(session_id, None)[0] == 2
+        assert len(list(service.export_messages(session_id, None))) == 2
+
+
+def test_cross_shard_queries_fan_out_and_merge(router):
+    """El historial de un usuario y la analítica combinan todos los shards."""
+    ana = uuid4()
+    for i in range(12):
+        session_id = f"s{i}"
+        with Session(router.engine_for(session_id)) as session:
+            session.add(Message(session_id=session_id, user_id=ana, content="hola", sender="user",
+                                message_length=4, word_count=1, created_at=START + timedelta(minutes=i)))
+            session.commit()
+    assert len({router.shard_for(f"s{i}") for i in range(12)}) > 1
+
+    history = MessageService(session=None).get_user_messages(ana, limit=5, offset=2)
+    assert [m.session_id for m in history] == ["s9", "s8", "s7", "s6", "s5"]
+
+    service = MessageAnalyticsService(session=None, cache=AnalyticsCache())
+    result = asyncio.run(service.summary(START, START + timedelta(hours=1)))
+    assert result["total_messages"] == 12
+    assert result["top_users"] == [{"user_id": str(ana), "count": 12}]
+
+
+def test_rebalance_after_adding_shard_is_idempotent(tmp_path, router, monkeypatch):
+    session_ids = [f"s{i}" for i in range(40)]
+    for session_id in session_ids:
+        with Session(router.engine_for(session_id)) as session:
+            session.add(Message(session_id=session_id, user_id=uuid4(), content="hola", sender="user",
+                                message_length=4, word_count=1))
+            session.commit()
+
+    grown = make_router(tmp_path, ["shard0", "shard1", "shard2", "shard3"], monkeypatch)
+    create_shard_tables()
+    planned = rebalance(grown, dry_run=True)
+    assert planned["sessions"] > 0 and planned["messages"] == 0
+
+    moved = rebalance(grown)
+    assert moved["sessions"] == moved["messages"] == planned["sessions"]
+    assert rebalance(grown) == {"sessions": 0, "messages": 0}
+    for session_id in session_ids:
+        owner = grown.shard_for(session_id)
+        for name, engine in grown.engines.items():
+            assert count(engine, session_id=session_id) == (1 if name == owner else 0)
+
+
+def test_rebalance_keeps_rows_written_during_the_copy(tmp_path, router, monkeypatch):
+    """Una fila escrita en el origen mientras se copia no se borra sin haberse copiado."""
+    with Session(router.engines["shard0"]) as session:
+        for i in range(3):
+            session.add(Message(session_id="s1", user_id=uuid4(), content=f"m{i}", sender="user",
+                                message_length=2, word_count=1))
+        session.commit()
+    # todas las sesiones pertenecen ahora a shard1
+    monkeypatch.setattr(router, "shard_for", lambda session_id: "shard1")
+
+    def late_write(connection):
+        # un worker con la configuración antigua escribe en shard0 tras la copia
+        with Session(router.engines["shard0"]) as session:
+            session.add(Message(session_id="s1", user_id=uuid4(), content="tarde", sender="user",
+                                message_length=5, word_count=1))
+            session.commit()
+    event.listen(router.engines["shard1"], "commit", late_write, once=True)
+
+    assert rebalance(router) == {"sessions": 1, "messages": 3}
+    assert count(router.engines["shard0"], session_id="s1") == 1
+    assert rebalance(router) == {"sessions": 1, "messages": 1}
+    assert count(router.engines["shard0"], session_id="s1") == 0
+    assert count(router.engines["shard1"], session_id="s1") == 4
+
+
+def test_rebalance_moves_messages_from_primary(tmp_path, router):
+    """Al activar el sharding, los mensajes del primario se reparten entre los shards."""
+    primary = make_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    SQLModel.metadata.create_all(primary)
+    session_ids = [f"s{i}" for i in range(10)]
+    with Session(primary) as session:
+        for session_id in session_ids:
+            session.add(Message(session_id=session_id, user_id=uuid4(), content="hola", sender="user",
+                                message_length=4, word_count=1))
+        session.commit()
+
+    assert rebalance(router) == {"sessions": 0, "messages": 0}  # sin el primario no los ve
+    assert rebalance(router, primary=primary) == {"sessions": 10, "messages": 10}
+    assert count(primary) == 0
+    for session_id in session_ids:
+        assert count(router.engine_for(session_id), session_id=session_id) == 1
+
+    # si el primario es uno de los shards no se trata como origen aparte
+    assert rebalance(router, primary=router.engines["shard0"]) == {"sessions": 0, "messages": 0}
+
+
+def test_user_history_route(memory_engine):
+    """GET /messages/user/{user_id} devuelve los mensajes con sus metadatos."""
+    ana = uuid4()
+    with Session(memory_engine) as session:
+        for i in range(2):
+            session.add(Message(session_id=f"s{i}", user_id=ana, content="hola mundo", sender="user",
+                                message_length=10, word_count=2, created_at=START + timedelta(minutes=i)))
+        session.commit()
+
+    def get_session_override():
+        with Session(memory_engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = get_session_override
+    try:
+        response = TestClient(app).get(f"/messages/user/{ana}?limit=1")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    [message] = response.json()
+    assert message["session_id"] == "s1"
+    assert message["user_id"] == str(ana)
+    assert message["metadata"] == {"word_count": 2, "character_count": 10, "created_at": "2024-05-01T10:01:00"}
+
+
+def test_concurrent_fan_outs_run_in_parallel(tmp_path):
+    """Dos consultas a todos los shards a la vez no esperan una a la otra."""
+    router = ShardRouter({name: make_engine(f"sqlite:///{tmp_path / name}.db") for name in ("a", "b")},
+                         concurrency=2)
+    # las 4 tareas (2 consultas × 2 shards) solo pasan la barrera si corren a la vez
+    barrier = threading.Barrier(4, timeout=5)
+    with ThreadPoolExecutor(max_workers=2) as requests:
+        results = list(requests.map(lambda _: router.fan_out(lambda session: barrier.wait() >= 0), range(2)))
+    assert results == [[True, True], [True, True]]
+    router.close()
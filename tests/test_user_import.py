@@ -0,0 +1,80 @@
+import io
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.users import bulk_import
+from app.users.bulk_import import import_users, read_rows
+from app.users.crud import verify_password
+from app.users.models import User
+
+
+@pytest.fixture(name="db")
+def db_fixture(memory_session):
+    memory_session.add(User(username="ana", email="ana@test.com", password_hash="x"))
+    memory_session.commit()
+    return memory_session
+
+
+def test_import_csv_reports_errors_per_row(db):
+    """Debe crear las filas válidas e informar de cada fila rechazada."""
+    data = io.StringIO(
+        "username,email,password,full_name\n"
+        "laura,laura@test.com,secreto1,Laura\n"
+        "ana,otra@test.com,secreto2,\n"
+        "pedro,pedro@test.com,,\n"
+        "marta,marta@test.com,secreto3,\n"
+        "marta,marta2@test.com,secreto4,\n"
+    )
+    report = import_users(db, read_rows(data, "csv"), batch_size=2, workers=1)
+
+    assert report.created == 2
+    assert {(e.line, e.username) for e in report.errors} == {(3, "ana"), (4, "pedro"), (6, "marta")}
+    laura = db.exec(select(User).where(User.username == "laura")).one()
+    assert laura.full_name == "Laura"
+    assert verify_password("secreto1", laura.password_hash)
+
+
+def test_import_ndjson_with_process_pool(db):
+    """Las contraseñas se hashean en el pool de procesos y el JSON inválido se reporta."""
+    data = io.StringIO(
+        '{"username": "u1", "email": "u1@test.com", "password": "p1"}\n'
+        "{no es json\n"
+        '{"username": "u2", "email": "u2@test.com", "password": "p2"}\n'
+    )
+    report = import_users(db, read_rows(data, "ndjson"), workers=2)
+
+    assert report.created == 2
+    assert [e.line for e in report.errors] == [2]
+    u2 = db.exec(select(User).where(User.username == "u2")).one()
+    assert verify_password("p2", u2.password_hash)
+
+
+def test_driver_integrity_error_falls_back_to_row_inserts(tmp_path, monkeypatch):
+    """Un conflicto lanzado por el driver (como el de COPY) no aborta la importación."""
+    url = f"sqlite:///{tmp_path / 'import.db'}"
+    engine = create_engine(url)
+    SQLModel.metadata.create_all(engine)
+
+    def raw_load(session, records):
+        # otro proceso registra "laura" después de la consulta de existentes
+        with Session(create_engine(url)) as other:
+            other.add(User(username="laura", email="laura@test.com", password_hash="x"))
+            other.commit()
+        cursor = session.connection().connection.cursor()
+        cursor.executemany(
+            'INSERT INTO "user" (id, username, email, password_hash, is_active, full_name, create_at) VALUES (?, ?, ?, ?, 1, ?, ?)',
+            [(r["id"].hex, r["username"], r["email"], r["password_hash"], r["full_name"], r["create_at"].isoformat()) for r in records],
+        )
+
+    monkeypatch.setattr(bulk_import, "_load", raw_load)
+    data = io.StringIO(
+        "username,email,password\n"
+        "laura,laura@test.com,secreto1\n"
+        "pedro,pedro@test.com,secreto2\n"
+    )
+    with Session(engine) as session:
+        report = import_users(session, read_rows(data, "csv"), workers=1)
+        assert report.created == 1
+        assert [(e.line, e.username) for e in report.errors] == [(2, "laura")]
+        assert session.exec(select(User).where(User.username == "pedro")).one()